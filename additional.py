@@ -1,7 +1,9 @@
+import re
 import enum
 import typing
 from functools import wraps
 
+import numpy as np
 import pandas as pd
 from collections import defaultdict, namedtuple
 from PyQt5 import QtCore
@@ -9,6 +11,12 @@ from PyQt5.Qt import Qt
 
 BoxOptions = namedtuple('BoxOptions', 'rows columns separator')
 SampleInfo = namedtuple('SampleInfo', 'code position end_position alarm')
+SampleSearch = namedtuple('SampleSearch', 'prefix')        # voice command for jumping to sample
+InputStatus = namedtuple('InputStatus', 'message')         # input device state change or failure for status bar
+AuditResult = namedtuple('AuditResult', 'alarms report')    # alarm mask of list rows and table of broken samples
+LayoutPlan = namedtuple('LayoutPlan', 'order boxes splits')     # list rows in planned order, -1 for free rows
+
+sample_number_pattern = re.compile(r'(\d+)\D')
 
 
 # -------------------- Generators --------------------
@@ -30,6 +38,39 @@ def range_generator(start: int, stop: int, step: int = 1, endpoint=False):
             result += step
 
 
+# -------------------- Typed columns --------------------
+missing_position = -1           # position sentinel for free rows
+weight_precision = 3            # digits after the decimal point kept for weights
+
+
+def parse_weights(values) -> typing.Tuple[np.ndarray, np.ndarray]:
+    """ Convert weight values (numbers or strings, '' for not weighed) to float64 array with NaN sentinel,
+        rounded to weight_precision. Both `.` and `,` are accepted as decimal separator
+        :return weights and mask of values which are not numbers """
+    if (numbers := np.asarray(values).ravel()).dtype.kind in 'biuf':       # already numbers, e.g. loaded column
+        return numbers.astype('float64').round(weight_precision), np.zeros(numbers.size, dtype='bool')
+    values = pd.Series(np.asarray(values, dtype='object').ravel(), dtype='object')
+    values = values.map(lambda value: value.strip().replace(',', '.') if isinstance(value, str) else value)
+    values = values.replace('', np.nan)
+    weights = pd.to_numeric(values, errors='coerce').to_numpy(dtype='float64')
+    return weights.round(weight_precision), np.isnan(weights) & values.notna().to_numpy()
+
+
+def to_weights(values) -> np.ndarray:
+    """ Convert weight values to float64 array, values which are not numbers are not weighed """
+    return parse_weights(values)[0]
+
+
+def format_weight(value) -> str:
+    """ Display weight value; not weighed is empty """
+    return '' if np.isnan(value) else np.format_float_positional(value, precision=weight_precision, trim='-')
+
+
+def format_position(value) -> str:
+    """ Display position value; missing is `-` """
+    return '-' if value == missing_position else str(value)
+
+
 # -------------------- Enumerations --------------------
 class ItemSelection(enum.Enum):
     # selection constants
@@ -56,6 +97,7 @@ class PositionStatus(int):
     UNPACKED_SAMPLE = 1
     PACKED_SAMPLE = 2
     FREE = 3
+    ALARM_SAMPLE = 4
 
 
 # -------------------- QAbstractTableModel --------------------
@@ -98,6 +140,26 @@ class AbstractDataFrameModel(QtCore.QAbstractTableModel):
             return True
         return False
 
+    def setDataRange(self, rows: np.ndarray, columns: np.ndarray, values: np.ndarray, role: int = Qt.EditRole) -> bool:
+        """ Set many cells at once: one vectorized write per column and one dataChanged per contiguous rows block
+            :param rows, columns
+                cell coordinates arrays
+            :param values
+                cell values array of the same size """
+        if role != Qt.EditRole or not rows.size:
+            return False
+        for column in np.unique(columns):
+            in_column = columns == column
+            self._df.iloc[rows[in_column], column] = pd.array(values[in_column], dtype=self._df.dtypes.iloc[column])
+        self.emit_rows_changed(rows, columns.min(), columns.max(), role)
+        return True
+
+    def emit_rows_changed(self, rows: np.ndarray, first_column: int, last_column: int, role: int = Qt.DisplayRole):
+        """ Emit one dataChanged per contiguous block of given rows """
+        rows = np.unique(rows)
+        for block in np.split(rows, np.flatnonzero(np.diff(rows) > 1) + 1):
+            self.dataChanged.emit(self.index(block[0], first_column), self.index(block[-1], last_column), [role])
+
     @property
     def df(self):
         return self._df
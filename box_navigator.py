@@ -0,0 +1,160 @@
+import settings
+import typing
+import numpy as np
+import pandas as pd
+from PyQt5 import QtWidgets, QtCore, QtGui
+from PyQt5.Qt import Qt
+from additional import sample_number_pattern
+
+
+# -------------------- Summary --------------------
+class BoxSummary:
+    """ Per-box packing summary. Counters are kept in arrays and updated incrementally on list changes """
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.clear()
+
+    def clear(self):
+        """ Drop summary of all rows """
+        self.packed = np.zeros(0, dtype='int32')        # packed samples per box
+        self.samples = np.zeros(0, dtype='int32')       # samples (non-free rows) per box
+        self.split = np.zeros(0, dtype='bool')          # box shares a sample with the previous one
+        self._packed_rows = np.zeros(0, dtype='bool')
+        self._sample_rows = np.zeros(0, dtype='bool')
+        self._numbers = np.zeros(0, dtype='object')     # sample number of each row
+
+    def __len__(self):
+        return self.packed.size
+
+    @property
+    def numbers(self) -> np.ndarray:
+        """ Return sample number of each list row (NaN if code has no number) """
+        return self._numbers
+
+    @property
+    def nbytes(self) -> int:
+        """ Return approximate memory used by summary. Sample numbers are short strings """
+        arrays = (self.packed, self.samples, self.split, self._packed_rows, self._sample_rows, self._numbers)
+        return sum(array.nbytes for array in arrays) + self._numbers.size * settings.short_str_size
+
+    @property
+    def rows(self) -> int:
+        """ Return amount of list rows the summary was built for """
+        return self._packed_rows.size
+
+    @property
+    def unpacked(self) -> np.ndarray:
+        return self.samples - self.packed
+
+    @property
+    def free(self) -> np.ndarray:
+        return self.capacity - self.samples
+
+    def has_alarm(self, box: int) -> bool:
+        """ Check if box contains a sample split with the previous or the next box """
+        return bool(self.split[box] or ((box + 1 < len(self)) and self.split[box + 1]))
+
+    @staticmethod
+    def _row_masks(df: pd.DataFrame):
+        """ Return packed mask, sample mask and sample numbers for given list rows """
+        codes = df[settings.code_column].astype('str')
+        numbers = codes.str.extract(sample_number_pattern, expand=False).to_numpy(dtype='object')
+        return df[settings.weight_column].notna().to_numpy(dtype='bool'), (codes != '').to_numpy(dtype='bool'), numbers
+
+    def rebuild(self, df: pd.DataFrame):
+        """ Recalculate summary for the whole list """
+        self._packed_rows, self._sample_rows, self._numbers = (np.array(mask) for mask in self._row_masks(df))
+        boxes = int(np.ceil(df.shape[0] / self.capacity))
+        box_of_row = np.arange(df.shape[0]) // self.capacity
+        self.packed = np.bincount(box_of_row, weights=self._packed_rows, minlength=boxes).astype('int32')
+        self.samples = np.bincount(box_of_row, weights=self._sample_rows, minlength=boxes).astype('int32')
+        self.split = np.zeros(boxes, dtype='bool')
+        self._update_split(range(boxes))
+
+    def update_rows(self, df: pd.DataFrame, first: int, last: int) -> range:
+        """ Update summary for changed list rows [first; last]. Returns the range of affected boxes """
+        packed, sample, numbers = self._row_masks(df.iloc[first:last + 1])
+        box_of_row = np.arange(first, last + 1) // self.capacity
+        np.add.at(self.packed, box_of_row, packed.astype('int32') - self._packed_rows[first:last + 1])
+        np.add.at(self.samples, box_of_row, sample.astype('int32') - self._sample_rows[first:last + 1])
+        self._packed_rows[first:last + 1] = packed
+        self._sample_rows[first:last + 1] = sample
+        self._numbers[first:last + 1] = numbers
+        boxes = range(box_of_row[0], min(box_of_row[-1] + 2, len(self)))
+        self._update_split(boxes)
+        return range(max(boxes.start - 1, 0), boxes.stop)
+
+    def _update_split(self, boxes: typing.Iterable[int]):
+        """ Compare sample numbers at the boundaries of given boxes """
+        for box in boxes:
+            if box == 0:
+                continue
+            boundary = box * self.capacity
+            prev_number, number = self._numbers[boundary - 1], self._numbers[boundary]
+            self.split[box] = isinstance(number, str) and (number == prev_number)
+
+
+# -------------------- QTableView --------------------
+class BoxNavigatorView(QtWidgets.QTableView):
+    jump_to_box = QtCore.pyqtSignal(int)
+
+    def __init__(self, parent=None):
+        super(BoxNavigatorView, self).__init__(parent)
+        self.clicked.connect(lambda index: self.jump_to_box.emit(index.row()))
+        self.activated.connect(lambda index: self.jump_to_box.emit(index.row()))
+
+
+# -------------------- QAbstractTableModel --------------------
+class BoxNavigatorModel(QtCore.QAbstractTableModel):
+    """ Model for box navigator panel. Reads counters from BoxSummary without touching the list """
+    columns = ('Box', 'Packed', 'Unpacked', 'Free')
+
+    def __init__(self, summary: BoxSummary):
+        super(BoxNavigatorModel, self).__init__()
+        self.summary = summary
+        self.number = ''
+
+    def rowCount(self, parent=None):
+        return len(self.summary)
+
+    def columnCount(self, parent=None):
+        return len(self.columns)
+
+    def headerData(self, section: int, orientation: Qt.Orientation, role: int = ...):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.columns[section]
+        if role == Qt.TextAlignmentRole:
+            return Qt.AlignCenter
+
+    def data(self, index: QtCore.QModelIndex, role=Qt.DisplayRole):
+        if not index.isValid():
+            return
+        box = index.row()
+        if role == Qt.DisplayRole:
+            if index.column() == 0:
+                return f'{self.number}.{box + 1}' if self.number else str(box + 1)
+            elif index.column() == 1:
+                return str(self.summary.packed[box])
+            elif index.column() == 2:
+                return str(self.summary.samples[box] - self.summary.packed[box])
+            else:
+                return str(self.summary.capacity - self.summary.samples[box])
+        elif role == Qt.TextAlignmentRole:
+            return Qt.AlignCenter
+        elif role == Qt.BackgroundColorRole:
+            if self.summary.has_alarm(box):
+                return QtGui.QColor(*settings.color_alarm)
+            elif self.summary.packed[box] == self.summary.samples[box]:
+                return QtGui.QColor(*settings.color_packed)
+
+    def refresh(self):
+        """ Notify views that the whole summary was rebuilt """
+        self.beginResetModel()
+        self.endResetModel()
+
+    def update_boxes(self, boxes: range):
+        """ Notify views that counters of given boxes were changed """
+        if not len(boxes):
+            return
+        self.dataChanged.emit(self.index(boxes.start, 0), self.index(boxes.stop - 1, self.columnCount() - 1),
+                              [Qt.DisplayRole])
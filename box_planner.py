@@ -0,0 +1,96 @@
+import numpy as np
+import pandas as pd
+from additional import BoxOptions, LayoutPlan
+
+
+def sample_groups(numbers: np.ndarray, samples: np.ndarray):
+    """ Group list rows by sample number. Rows without number are separate samples, free rows are skipped.
+        Groups are ordered by their first row, rows of each group keep the list order
+        :param numbers
+            sample number of each list row, NaN if code has no number
+        :param samples
+            mask of not free list rows
+        :return rows grouped by sample, first element index and size of each group """
+    rows = np.flatnonzero(samples)
+    keys, _ = pd.factorize(numbers[rows])           # numbered in order of appearance, -1 if no number
+    no_number = keys < 0
+    keys[no_number] = keys.max(initial=-1) + 1 + np.arange(no_number.sum())
+    order = np.argsort(keys, kind='stable')
+    groups = keys[order]
+    starts = np.flatnonzero(np.diff(groups, prepend=-1))
+    sizes = np.diff(np.append(starts, groups.size))
+    return rows[order], starts, sizes
+
+
+def pack_groups(sizes: np.ndarray, capacity: int):
+    """ Best fit decreasing: place each group to the open box with the least free places it fits in.
+        Boxes are kept in buckets by free places, a bit mask of non-empty buckets finds the best one at once.
+        Groups larger than a box take whole boxes and start the box with their rest
+        :return box of each group (the last one for large groups) and the group which opened each box """
+    group_box = np.empty(sizes.size, dtype='int64')
+    box_opener = []
+    buckets = [[] for _ in range(capacity + 1)]     # boxes by amount of free places
+    mask = 0                                        # bit n is set if some box has n free places
+    by_size = np.argsort(-sizes, kind='stable')
+    for group, size in zip(by_size.tolist(), sizes[by_size].tolist()):
+        if size > capacity:
+            full, rest = divmod(size, capacity)
+            boxes = full + bool(rest)
+            box_opener.extend([group] * boxes)
+            group_box[group] = len(box_opener) - 1
+            free = (capacity - rest) % capacity
+        else:
+            if fit := mask >> size:
+                free = size + (fit & -fit).bit_length() - 1
+                box = buckets[free].pop()
+                if not buckets[free]:
+                    mask &= ~(1 << free)
+            else:
+                free = capacity
+                box = len(box_opener)
+                box_opener.append(group)
+            group_box[group] = box
+            free -= size
+        if free:
+            buckets[free].append(group_box[group])
+            mask |= 1 << free
+    return group_box, np.array(box_opener, dtype='int64')
+
+
+def plan_layout(numbers: np.ndarray, samples: np.ndarray, box_options: BoxOptions) -> LayoutPlan:
+    """ Plan list order and free rows, so samples do not span boxes. Boxes follow the list order of samples
+        which opened them, samples in box keep the list order
+        :param numbers
+            sample number of each list row, NaN if code has no number
+        :param samples
+            mask of not free list rows """
+    capacity = box_options.rows * box_options.columns
+    rows, starts, sizes = sample_groups(numbers, samples)
+    if not sizes.size:
+        return LayoutPlan(np.zeros(0, dtype='int64'), 0, 0)
+    group_box, box_opener = pack_groups(sizes, capacity)
+
+    # order boxes by the first row of the opener, boxes of a large group stay together
+    first_rows = rows[starts]
+    box_order = np.lexsort((np.arange(box_opener.size), first_rows[box_opener]))
+    box_place = np.empty(box_order.size, dtype='int64')
+    box_place[box_order] = np.arange(box_order.size)
+
+    # places taken by each group in its box, the rest of large group comes first
+    large = sizes > capacity
+    used = np.where(large, sizes - (np.ceil(sizes / capacity).astype('int64') - 1) * capacity, sizes)
+    groups = np.lexsort((first_rows, ~large, box_place[group_box]))
+    boxes = box_place[group_box[groups]]
+    offsets = np.cumsum(used[groups]) - used[groups]
+    box_starts = np.flatnonzero(np.diff(boxes, prepend=-1))
+    offsets -= np.repeat(offsets[box_starts], np.diff(np.append(box_starts, groups.size)))
+    group_start = np.empty(sizes.size, dtype='int64')
+    group_start[groups] = boxes * capacity + offsets - (sizes[groups] - used[groups])
+
+    # fill list places of grouped rows, the rest are free rows
+    group_of_row = np.repeat(np.arange(sizes.size), sizes)
+    places = group_start[group_of_row] + np.arange(rows.size) - starts[group_of_row]
+    order = np.full(places.max() + 1, -1, dtype='int64')
+    order[places] = rows
+    splits = int((np.ceil(sizes / capacity) - 1).sum())
+    return LayoutPlan(order, box_order.size, splits)
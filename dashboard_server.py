@@ -0,0 +1,214 @@
+import asyncio
+import base64
+import hashlib
+import json
+import struct
+import sys
+import typing
+import settings
+from threading import Thread, Event
+
+websocket_guid = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+dashboard_page = '''<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>Shipment Packing Assistant</title></head>
+<body><h3>Packing progress</h3><pre id="state">connecting...</pre>
+<script>
+const state = {};
+const ws = new WebSocket(`ws://${location.host}/ws`);
+ws.onmessage = (event) => {
+    const message = JSON.parse(event.data);
+    if (message.type === 'snapshot') { Object.keys(state).forEach(k => delete state[k]); Object.assign(state, message.shipments); }
+    else if (message.type === 'remove') { delete state[message.shipment]; }
+    else {
+        const shipment = state[message.shipment] = state[message.shipment] || {boxes: []};
+        for (const [key, value] of Object.entries(message.changes)) {
+            if (key === 'boxes') { for (const [box, counters] of Object.entries(value)) shipment.boxes[box] = counters; }
+            else shipment[key] = value;
+        }
+        if ('box_amount' in message.changes) shipment.boxes.length = message.changes.box_amount;
+    }
+    document.getElementById('state').textContent = Object.values(state).map(s =>
+        `#${s.number}: ${s.packed}/${s.total} packed, alarms: ${s.alarms}\\n` +
+        s.boxes.map((b, i) => `  box ${i + 1}: ${b[0]}/${b[1]}`).join('\\n')).join('\\n\\n');
+};
+ws.onclose = () => { document.getElementById('state').textContent += '\\n\\ndisconnected'; };
+</script></body></html>
+'''
+
+
+def summary_diff(old: dict, new: dict) -> dict:
+    """ Return changed fields of shipment summary. Boxes are compared one by one """
+    changes = {key: value for key, value in new.items() if key != 'boxes' and old.get(key) != value}
+    old_boxes, new_boxes = old.get('boxes', []), new['boxes']
+    boxes = {box: counters for box, counters in enumerate(new_boxes)
+             if box >= len(old_boxes) or old_boxes[box] != counters}
+    if boxes:
+        changes['boxes'] = boxes
+    if len(old_boxes) != len(new_boxes):
+        changes['box_amount'] = len(new_boxes)
+    return changes
+
+
+class DashboardServer(Thread):
+    """ Read-only packing progress server. Runs its own asyncio loop in a separate thread:
+        GET /          dashboard page
+        GET /summary   JSON snapshot of all shipments
+        GET /ws        WebSocket: snapshot on connect, then diffs of changed fields """
+    def __init__(self, host: str = None, port: int = None):
+        super(DashboardServer, self).__init__(daemon=True)
+        self.host = host or settings.dashboard_host
+        self.port = port if port is not None else settings.dashboard_port
+        self.shipments = {}             # last published summaries, owned by the server loop
+        self.published = {}             # last published summaries, owned by the publishing (GUI) thread
+        self.clients = set()
+        self.loop = None
+        self.server = None
+        self.ready = Event()
+        self.error = None               # address binding failure
+
+    # -------------------- GUI thread --------------------
+    def start(self) -> None:
+        """ Start server thread and wait until it listens. Raises OSError if the address cannot be bound """
+        super(DashboardServer, self).start()
+        self.ready.wait()
+        if self.error:
+            raise self.error
+
+    def stop(self):
+        if self.loop:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+
+    def publish(self, shipment_id: str, summary: dict):
+        """ Send changed fields of shipment summary to subscribers """
+        changes = summary_diff(self.published.get(shipment_id, {}), summary)
+        self.published[shipment_id] = summary
+        if changes:
+            self.loop.call_soon_threadsafe(self._apply, shipment_id, summary,
+                                           {'type': 'diff', 'shipment': shipment_id, 'changes': changes})
+
+    def remove(self, shipment_id: str):
+        """ Stop showing the shipment """
+        if self.published.pop(shipment_id, None) is not None:
+            self.loop.call_soon_threadsafe(self._apply, shipment_id, None,
+                                           {'type': 'remove', 'shipment': shipment_id})
+
+    # -------------------- server loop --------------------
+    def run(self) -> None:
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.server = self.loop.run_until_complete(asyncio.start_server(self.handle, self.host, self.port))
+            self.port = self.server.sockets[0].getsockname()[1]
+        except OSError as e:
+            self.error = e
+            self.loop.close()
+            self.loop = None
+            return
+        finally:
+            self.ready.set()
+        try:
+            self.loop.run_forever()
+        finally:
+            self.server.close()
+            self.loop.close()
+
+    def _apply(self, shipment_id: str, summary: typing.Optional[dict], message: dict):
+        """ Store summary and broadcast message. Slow clients are dropped and get a snapshot on reconnect """
+        if summary is None:
+            self.shipments.pop(shipment_id, None)
+        else:
+            self.shipments[shipment_id] = summary
+        frame = self.frame(json.dumps(message))
+        for queue in list(self.clients):
+            try:
+                queue.put_nowait(frame)
+            except asyncio.QueueFull:
+                self.clients.discard(queue)
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(None)
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """ Serve one HTTP request """
+        try:
+            request = await reader.readuntil(b'\r\n\r\n')
+            request_line, *header_lines = request.decode('latin-1').split('\r\n')
+            method, path, _ = request_line.split(' ', 2)
+            headers = {name.strip().lower(): value.strip()
+                       for name, _, value in (line.partition(':') for line in header_lines if line)}
+            if method != 'GET':
+                self.respond(writer, '405 Method Not Allowed', 'text/plain', b'')
+            elif path == '/ws' and headers.get('upgrade', '').lower() == 'websocket':
+                await self.serve_websocket(reader, writer, headers['sec-websocket-key'])
+            elif path == '/summary':
+                self.respond(writer, '200 OK', 'application/json', json.dumps(self.shipments).encode('utf-8'))
+            elif path == '/':
+                self.respond(writer, '200 OK', 'text/html; charset=utf-8', dashboard_page.encode('utf-8'))
+            else:
+                self.respond(writer, '404 Not Found', 'text/plain', b'')
+            await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError, KeyError) as e:
+            print(f'Dashboard: {e!r}', file=sys.stderr)
+        finally:
+            writer.close()
+
+    @staticmethod
+    def respond(writer: asyncio.StreamWriter, status: str, content_type: str, body: bytes):
+        writer.write(f'HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\nContent-Length: {len(body)}\r\n'
+                     f'Cache-Control: no-cache\r\nConnection: close\r\n\r\n'.encode('latin-1') + body)
+
+    async def serve_websocket(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, key: str):
+        """ Push snapshot and diffs to client until it disconnects """
+        accept = base64.b64encode(hashlib.sha1((key + websocket_guid).encode('latin-1')).digest()).decode('latin-1')
+        writer.write(f'HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n'
+                     f'Sec-WebSocket-Accept: {accept}\r\n\r\n'.encode('latin-1'))
+        queue = asyncio.Queue(maxsize=settings.dashboard_queue_size)
+        queue.put_nowait(self.frame(json.dumps({'type': 'snapshot', 'shipments': self.shipments})))
+        self.clients.add(queue)
+        receiver = asyncio.ensure_future(self.receive(reader, writer))
+        try:
+            while not receiver.done():
+                sender = asyncio.ensure_future(queue.get())
+                await asyncio.wait((sender, receiver), return_when=asyncio.FIRST_COMPLETED)
+                if not sender.done():
+                    sender.cancel()
+                    break
+                if (frame := sender.result()) is None:        # client was dropped
+                    break
+                writer.write(frame)
+                await writer.drain()
+        finally:
+            self.clients.discard(queue)
+            receiver.cancel()
+
+    async def receive(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """ Read client frames: answer pings, finish on close or disconnect """
+        while True:
+            try:
+                head = await reader.readexactly(2)
+            except (asyncio.IncompleteReadError, ConnectionError):
+                return
+            opcode, length = head[0] & 0x0F, head[1] & 0x7F
+            if length == 126:
+                length = struct.unpack('!H', await reader.readexactly(2))[0]
+            elif length == 127:
+                length = struct.unpack('!Q', await reader.readexactly(8))[0]
+            mask = await reader.readexactly(4) if head[1] & 0x80 else bytes(4)
+            payload = bytes(byte ^ mask[i % 4] for i, byte in enumerate(await reader.readexactly(length)))
+            if opcode == 0x8:           # close
+                writer.write(self.frame(payload, opcode=0x8))
+                return
+            if opcode == 0x9:           # ping
+                writer.write(self.frame(payload, opcode=0xA))
+
+    @staticmethod
+    def frame(data: typing.Union[str, bytes], opcode: int = 0x1) -> bytes:
+        """ Build unmasked server frame """
+        payload = data.encode('utf-8') if isinstance(data, str) else data
+        if len(payload) < 126:
+            header = struct.pack('!BB', 0x80 | opcode, len(payload))
+        elif len(payload) < 1 << 16:
+            header = struct.pack('!BBH', 0x80 | opcode, 126, len(payload))
+        else:
+            header = struct.pack('!BBQ', 0x80 | opcode, 127, len(payload))
+        return header + payload
@@ -0,0 +1,49 @@
+from threading import Thread, Condition
+
+
+class InputSource(Thread):
+    """ Base class for threaded weight and command sources.
+        Subclasses read their device in `run` and pass the results to callback(value, command: bool):
+        value is a weight string if command is False, else a command from settings.acceptable_commands
+        or InputStatus with device failure to show """
+    def __init__(self, callback):
+        """
+        :param callback: a function that processes the received value
+        """
+        super(InputSource, self).__init__(daemon=True)
+        self.callback = callback
+        self.running = False
+        self.suspended = True
+        self.state = Condition()
+
+    def start(self) -> None:
+        self.running = True
+        super(InputSource, self).start()
+
+    def stop(self):
+        with self.state:
+            self.running = False
+            self.state.notify()
+
+    def switch_pause(self):
+        """ Suspend/Resume the thread loop """
+        with self.state:
+            if self.suspended:
+                self.suspended = False
+                self.state.notify()
+            else:
+                self.suspended = True
+
+    def wait_retry(self, delay: float):
+        """ Pause the thread loop before retrying a failed device. Returns earlier if the thread is stopped """
+        with self.state:
+            if self.running:
+                self.state.wait(delay)
+
+    def wait_if_suspended(self) -> bool:
+        """ Block the thread loop while suspended. Returns True if the loop was resumed """
+        with self.state:
+            if not self.suspended:
+                return False
+            self.state.wait()       # suspend in required
+            return True
@@ -0,0 +1,95 @@
+import json
+import pathlib
+import typing
+import numpy as np
+import pandas as pd
+
+""" Native shipment file: fixed header and raw column arrays, so the file can be loaded through memory-mapping
+
+    magic (8 bytes) | header length (uint64) | JSON header | column arrays, each aligned to `alignment` bytes
+"""
+magic = b'SPA2SHIP'
+version = 1
+alignment = 64
+extension = '.spa'
+
+
+def _aligned(offset: int) -> int:
+    return (offset + alignment - 1) // alignment * alignment
+
+
+def _number_or_str(value: str):
+    """ Convert string back to number if possible """
+    for number_type in (int, float):
+        try:
+            return number_type(value)
+        except ValueError:
+            pass
+    return value
+
+
+def _column_array(series: pd.Series) -> typing.Tuple[np.ndarray, bool]:
+    """ Convert column to a fixed-width array. Returns array and flag if numbers must be restored on load """
+    if pd.api.types.is_numeric_dtype(series.dtype):
+        return np.ascontiguousarray(series.to_numpy()), False
+    values = series.to_numpy(dtype='object')
+    mixed = not all(isinstance(value, str) for value in values)
+    return values.astype('str'), mixed
+
+
+def save(filepath: typing.Union[str, pathlib.Path], df: pd.DataFrame, **meta):
+    """ Save shipment list to native file
+        :param filepath
+            target file path
+        :param df
+            shipment list
+        :param meta
+            JSON-serializable shipment attributes, e.g. number and box options """
+    arrays, columns = [], []
+    offset = 0
+    for name in df.columns:
+        array, mixed = _column_array(df[name])
+        arrays.append(array)
+        columns.append({'name': name, 'dtype': array.dtype.str, 'offset': offset, 'mixed': mixed})
+        offset = _aligned(offset + array.nbytes)
+    header = json.dumps({'version': version, 'rows': df.shape[0], 'columns': columns, 'meta': meta},
+                        ensure_ascii=False).encode('utf-8')
+    data_start = _aligned(len(magic) + 8 + len(header))
+
+    with open(filepath, 'wb') as file:
+        file.write(magic)
+        file.write(np.uint64(len(header)).tobytes())
+        file.write(header)
+        for array, column in zip(arrays, columns):
+            file.seek(data_start + column['offset'])
+            file.write(array.tobytes())
+        file.truncate(data_start + offset)
+
+
+def load(filepath: typing.Union[str, pathlib.Path]) -> typing.Tuple[pd.DataFrame, dict]:
+    """ Load shipment list from native file. Returns shipment list and meta attributes """
+    with open(filepath, 'rb') as file:
+        if file.read(len(magic)) != magic:
+            raise ValueError(f'"{filepath}" is not a shipment file!')
+        header_length = int(np.frombuffer(file.read(8), dtype='uint64')[0])
+        header = json.loads(file.read(header_length).decode('utf-8'))
+    if header['version'] > version:
+        raise ValueError(f'Shipment file version {header["version"]} is not supported!')
+    data_start = _aligned(len(magic) + 8 + header_length)
+
+    data = {}
+    for column in header['columns']:
+        dtype = np.dtype(column['dtype'])
+        if header['rows'] and dtype.itemsize:
+            array = np.memmap(filepath, dtype=dtype, mode='r', offset=data_start + column['offset'],
+                              shape=(header['rows'],))
+        else:
+            array = np.empty(header['rows'], dtype=dtype)
+        if dtype.kind == 'U':
+            series = pd.Series(array, dtype='object')
+            if column['mixed']:          # restore numbers in mixed column
+                series = series.map(_number_or_str)
+            data[column['name']] = series
+        else:
+            data[column['name']] = np.array(array)     # copy, so the file is not locked by the map
+    return pd.DataFrame(data), header['meta']
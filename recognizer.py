@@ -1,29 +1,142 @@
 import settings
 import pathlib
 import sounddevice as sd
+import numpy as np
 import vosk
 import queue
 import sys
 import json
-from threading import Thread, Condition
+import re
+import time
+from math import gcd
+from collections import deque, namedtuple
+from input_source import InputSource
+from additional import SampleSearch
 
+RecognizerStats = namedtuple('RecognizerStats', 'audio_seconds speech_seconds decode_seconds cpu_seconds '
+                                                'speech_ratio real_time_factor')
 
-class Recognizer(Thread):
+
+def model_sample_rate(model_path: pathlib.Path) -> int:
+    """ Read sample rate the model was trained at from its feature config """
+    config = model_path.joinpath('conf', 'mfcc.conf')
+    if config.exists() and (match := re.search(r'--sample-frequency=(\d+)', config.read_text())):
+        return int(match.group(1))
+    return settings.default_model_sample_rate
+
+
+class PolyphaseResampler:
+    """ Streaming rational resampler: upsampling by `up`, low-pass FIR and downsampling by `down`
+        are computed at once in polyphase form, only for output samples """
+    def __init__(self, rate_in: int, rate_out: int, taps_per_phase: int = 32):
+        """
+        :param rate_in: input sample rate
+        :param rate_out: output sample rate
+        :param taps_per_phase: FIR length per polyphase branch
+        """
+        divisor = gcd(rate_in, rate_out)
+        self.up, self.down = rate_out // divisor, rate_in // divisor
+        self.taps = taps_per_phase
+        # windowed sinc low-pass at the lower Nyquist frequency, gain compensates zero stuffing
+        cutoff = 0.5 / max(self.up, self.down)
+        t = np.arange(self.taps * self.up) - (self.taps * self.up - 1) / 2
+        fir = 2 * cutoff * np.sinc(2 * cutoff * t) * np.kaiser(t.size, 8.0) * self.up
+        self.bank = fir.reshape(self.taps, self.up).T.astype('float32')        # bank[phase, tap]
+        self.history = np.zeros(self.taps - 1, dtype='float32')
+        self.consumed = 0           # input samples consumed
+        self.produced = 0           # output samples produced
+
+    def process(self, samples: np.ndarray) -> np.ndarray:
+        """ Resample next block of samples """
+        block = np.concatenate((self.history, samples.astype('float32')))
+        base = self.consumed - self.history.size            # input index of block[0]
+        self.consumed += samples.size
+        end = (self.consumed * self.up - 1) // self.down + 1
+        outputs = np.arange(self.produced, end, dtype='int64')
+        self.produced = max(end, self.produced)
+        self.history = block[block.size - self.taps + 1:]
+
+        position = outputs * self.down
+        phases = position % self.up
+        windows = (position // self.up - base)[:, None] - np.arange(self.taps)[None, :]
+        return np.einsum('ij,ij->i', block[windows], self.bank[phases])
+
+
+class VoiceActivityGate:
+    """ Energy-based voice activity gate. Passes speech blocks with pre- and post-roll and drops silence """
+    def __init__(self, block_ms: int):
+        """
+        :param block_ms: duration of one audio block in milliseconds
+        """
+        self.pre_roll = deque(maxlen=int(np.ceil(settings.vad_pre_roll_ms / block_ms)))
+        self.post_roll_blocks = int(np.ceil(settings.vad_post_roll_ms / block_ms))
+        self.hangover = 0               # blocks left to pass after the speech end
+        self.active = False             # speech segment is being passed
+        self.noise_floor = None
+
+    def process(self, block: bytes):
+        """ Return list of blocks to pass to recognizer and flag of speech segment end """
+        samples = np.frombuffer(block, dtype='int16').astype('float32')
+        energy = float(np.sqrt(np.mean(samples ** 2))) if samples.size else 0.
+        if self.noise_floor is None:
+            self.noise_floor = energy
+        is_speech = energy > max(settings.vad_min_rms, self.noise_floor * settings.vad_threshold)
+
+        if is_speech:
+            passed = list(self.pre_roll) + [block]
+            self.pre_roll.clear()
+            self.hangover = self.post_roll_blocks
+            self.active = True
+            return passed, False
+        # adapt noise floor on silence only
+        self.noise_floor += (energy - self.noise_floor) * settings.vad_noise_adaptation
+        if self.active:
+            passed = [block] if self.hangover else []
+            self.hangover = max(self.hangover - 1, 0)
+            self.active = self.hangover > 0
+            return passed, not self.active
+        self.pre_roll.append(block)
+        return [], False
+
+
+class Recognizer(InputSource):
     def __init__(self, callback, device=None):
         """
         :param callback: a function that processes the recognized value
         :param device: audio input device
         """
-        super(Recognizer, self).__init__(daemon=True)
-        device_info = sd.query_devices(device, kind='input')
-        self.sample_rate = int(device_info['default_samplerate'])
+        super(Recognizer, self).__init__(callback)
+        model_path = pathlib.Path().joinpath(settings.use_model)
+        # open device at the model rate if supported, else resample captured audio
+        self.sample_rate = model_sample_rate(model_path)
+        try:
+            sd.check_input_settings(device, samplerate=self.sample_rate, channels=1, dtype='int16')
+            self.capture_rate = self.sample_rate
+            self.resampler = None
+        except sd.PortAudioError:
+            device_info = sd.query_devices(device, kind='input')
+            self.capture_rate = int(device_info['default_samplerate'])
+            self.resampler = PolyphaseResampler(self.capture_rate, self.sample_rate)
+        self.device = device
+        self.block_size = self.capture_rate * settings.audio_block_ms // 1000
 
-        self.model = vosk.Model(pathlib.Path().joinpath(settings.use_model).as_posix())
+        self.model = vosk.Model(model_path.as_posix())
         self.buffer = queue.Queue()
-        self.callback = callback
-        self.running = False
-        self.suspended = True
-        self.state = Condition()
+        self.gate = VoiceActivityGate(settings.audio_block_ms) if settings.vad_enabled else None
+        # statistics
+        self.audio_samples = 0
+        self.speech_samples = 0
+        self.decode_time = 0.
+        self.cpu_time = 0.
+
+    @property
+    def stats(self) -> RecognizerStats:
+        """ Return processing statistics for gate and recognizer tuning """
+        audio_seconds = self.audio_samples / self.sample_rate
+        speech_seconds = self.speech_samples / self.sample_rate
+        return RecognizerStats(audio_seconds, speech_seconds, self.decode_time, self.cpu_time,
+                               speech_seconds / audio_seconds if audio_seconds else 0.,
+                               self.decode_time / audio_seconds if audio_seconds else 0.)
 
     def fill_buffer(self, data, frames, time, status):
         """This is called (from a separate thread) for each audio block."""
@@ -31,37 +144,36 @@ class Recognizer(Thread):
             print(status, file=sys.stderr)
         self.buffer.put(bytes(data))
 
-    def start(self) -> None:
-        super(Recognizer, self).start()
-        self.running = True
-
-    def stop(self):
-        self.running = False
-
-    def switch_pause(self):
-        """ Suspend/Resume the thread loop """
-        with self.state:
-            if self.suspended:
-                self.suspended = False
-                self.state.notify()
-            else:
-                self.suspended = True
-
     def run(self) -> None:
         """ Recognizer loop """
-        with sd.RawInputStream(samplerate=self.sample_rate, blocksize=8000, dtype='int16', channels=1,
-                               callback=self.fill_buffer):
+        with sd.RawInputStream(device=self.device, samplerate=self.capture_rate, blocksize=self.block_size,
+                               dtype='int16', channels=1, callback=self.fill_buffer):
             rec = vosk.KaldiRecognizer(self.model, self.sample_rate)
             while self.running:
-                with self.state:
-                    if self.suspended:
-                        self.state.wait()       # suspend in required
-                        self.buffer.queue.clear()
+                if self.wait_if_suspended():
+                    self.buffer.queue.clear()
+                    continue
                 # processing
-                data = self.buffer.get()
-                if rec.AcceptWaveform(data):
-                    text = json.loads(rec.Result())['text']       # get text from recognizer result
-                    self.interpret(text)
+                try:
+                    data = self.buffer.get(timeout=1)
+                except queue.Empty:
+                    continue
+                cpu_start = time.thread_time()
+                if self.resampler:
+                    samples = self.resampler.process(np.frombuffer(data, dtype='int16'))
+                    data = np.clip(np.round(samples), -32768, 32767).astype('int16').tobytes()
+                self.audio_samples += len(data) // 2
+                blocks, segment_ended = self.gate.process(data) if self.gate else ([data], False)
+                for block in blocks:
+                    self.speech_samples += len(block) // 2
+                    decode_start = time.perf_counter()
+                    accepted = rec.AcceptWaveform(block)
+                    self.decode_time += time.perf_counter() - decode_start
+                    if accepted:
+                        self.interpret(json.loads(rec.Result())['text'])       # get text from recognizer result
+                if segment_ended:       # flush the rest of utterance, silence after it will not be passed
+                    self.interpret(json.loads(rec.FinalResult())['text'])
+                self.cpu_time += time.thread_time() - cpu_start
 
     def interpret(self, data: str):
         """ Interpret the recognized text to float value or command and callback """
@@ -71,8 +183,15 @@ class Recognizer(Thread):
             self.callback(settings.acceptable_words[data], False)
             return
 
+        search = data.startswith(settings.search_command)
+        if search:
+            data = data[len(settings.search_command):]
         for key, value in settings.acceptable_words.items():
             data = data.replace(key, value)
+        if search:
+            if prefix := data.replace(' ', ''):
+                self.callback(SampleSearch(prefix), True)
+            return
 
         data = data.replace(' ', '.')
         # print(data)
@@ -82,4 +201,3 @@ class Recognizer(Thread):
         except ValueError:
             if data in settings.acceptable_commands.keys():
                 self.callback(settings.acceptable_commands[data], True)
-
@@ -0,0 +1,71 @@
+import typing
+import numpy as np
+import pandas as pd
+
+max_char = '\U0010ffff'
+
+
+class SampleIndex:
+    """ Sorted prefix index over sample codes. Lookup is a pair of binary searches """
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        """ Drop index of all rows """
+        self.keys = np.zeros(0, dtype='object')         # sorted codes
+        self.rows = np.zeros(0, dtype='int64')          # list row of each key
+        self.codes = np.zeros(0, dtype='object')        # code of each list row
+
+    def __len__(self):
+        return self.codes.size
+
+    @property
+    def nbytes(self) -> int:
+        """ Return memory used by index. Code strings are shared with the list """
+        return self.keys.nbytes + self.rows.nbytes + self.codes.nbytes
+
+    def rebuild(self, codes: pd.Series):
+        """ Rebuild index for the whole list """
+        self.codes = codes.astype('str').to_numpy(dtype='object', copy=True)
+        self.rows = np.argsort(self.codes, kind='stable')
+        self.keys = self.codes[self.rows]
+
+    def update_rows(self, codes: pd.Series, first: int):
+        """ Update index for changed list rows starting from first. Only rows with changed codes are touched """
+        new_codes = codes.astype('str').to_numpy(dtype='object')
+        changed = np.flatnonzero(new_codes != self.codes[first:first + new_codes.size])
+        for row, code in zip(changed + first, new_codes[changed]):
+            # remove old key
+            lo, hi = self._bounds(self.codes[row], exact=True)
+            position = lo + np.flatnonzero(self.rows[lo:hi] == row)[0]
+            self.keys = np.delete(self.keys, position)
+            self.rows = np.delete(self.rows, position)
+            # insert new key keeping equal keys ordered by row
+            lo, hi = self._bounds(code, exact=True)
+            position = lo + np.searchsorted(self.rows[lo:hi], row)
+            self.keys = np.insert(self.keys, position, code)
+            self.rows = np.insert(self.rows, position, row)
+            self.codes[row] = code
+
+    def _bounds(self, prefix: str, exact: bool = False) -> typing.Tuple[int, int]:
+        """ Return keys range starting with prefix or equal to it """
+        lo = np.searchsorted(self.keys, prefix, side='left')
+        hi = np.searchsorted(self.keys, prefix if exact else prefix + max_char, side='right')
+        return int(lo), int(hi)
+
+    def find(self, prefix: str, after: int = -1) -> int:
+        """ Return the first list row after given one with code starting with prefix, wrapping around.
+            Returns -1 if nothing is found """
+        if not prefix:
+            return -1
+        lo, hi = self._bounds(prefix)
+        if lo == hi:
+            return -1
+        rows = self.rows[lo:hi]
+        next_rows = rows[rows > after]
+        return int(next_rows.min() if next_rows.size else rows.min())
+
+    def count(self, prefix: str) -> int:
+        """ Return amount of codes starting with prefix """
+        lo, hi = self._bounds(prefix)
+        return hi - lo
@@ -0,0 +1,78 @@
+import re
+import typing
+import settings
+import serial
+from collections import deque
+from additional import InputStatus
+from input_source import InputSource
+
+reading_pattern = re.compile(rb'([-+]?)\s*(\d+(?:[.,]\d+)?)')
+
+
+class ScaleReader(InputSource):
+    """ Digital scale reader. Reads weight lines from a serial port and passes each stable reading once """
+    def __init__(self, callback, port: str = None):
+        """
+        :param callback: a function that processes the weight value
+        :param port: serial port name or path, e.g. COM3 or /dev/ttyUSB0 (pseudo-terminal path works as well)
+        """
+        super(ScaleReader, self).__init__(callback)
+        self.port = port or settings.scale_port
+        self.readings = deque(maxlen=settings.scale_stable_count)
+        self.armed = True           # reading will be passed only once until the scale is unloaded
+
+    def run(self) -> None:
+        """ Reader loop. The port is (re)opened on demand, failures are reported to callback
+            and retried after settings.scale_retry_delay """
+        connection, failed = None, False
+        while self.running:
+            resumed = self.wait_if_suspended()
+            if not self.running:
+                break
+            try:
+                if connection is None:
+                    connection = serial.Serial(self.port, baudrate=settings.scale_baudrate,
+                                               timeout=settings.scale_timeout)
+                    resumed = True
+                    if failed:
+                        self.callback(InputStatus(f'Scale connected at {self.port}.'), True)
+                        failed = False
+                if resumed:
+                    connection.reset_input_buffer()
+                    self.readings.clear()
+                    continue
+                line = connection.readline()
+            except (serial.SerialException, ValueError) as e:
+                self.callback(InputStatus(f'Scale error: {e}'), True)
+                failed = True
+                if connection is not None:
+                    connection.close()
+                    connection = None
+                self.wait_retry(settings.scale_retry_delay)
+                continue
+            if (weight := self.parse(line)) is not None:
+                self.accept(weight)
+        if connection is not None:
+            connection.close()
+
+    @staticmethod
+    def parse(line: bytes) -> typing.Optional[float]:
+        """ Extract weight value from the scale output line. Unstable readings are skipped """
+        if not line or settings.scale_unstable_marker in line:
+            return None
+        if not (match := reading_pattern.search(line)):
+            return None
+        return float(match.group(1) + match.group(2).replace(b',', b'.'))
+
+    def accept(self, weight: float):
+        """ Debounce readings: callback once when the last readings are stable, rearm when the scale is unloaded """
+        if weight <= settings.scale_zero_threshold:
+            self.armed = True
+            self.readings.clear()
+            return
+        self.readings.append(weight)
+        if self.armed and (len(self.readings) == self.readings.maxlen) and \
+                (max(self.readings) - min(self.readings) <= settings.scale_tolerance):
+            self.armed = False
+            result = round(sum(self.readings) / len(self.readings), settings.scale_precision)
+            self.callback(str(result), False)
@@ -0,0 +1,99 @@
+import typing
+from PyQt5 import QtWidgets, QtCore
+
+
+class SelectionCoordinator(QtCore.QObject):
+    """ Synchronizes selection between list and map views.
+        Selection changes are coalesced within one event loop tick, changes made by the coordinator itself
+        are ignored, so the views do not ping-pong selection signals """
+    sample_changed = QtCore.pyqtSignal(int)         # selected list row, -1 if nothing is selected
+
+    def __init__(self, list_view: QtWidgets.QTableView, map_view: QtWidgets.QTableView,
+                 item_position: typing.Callable, parent: QtCore.QObject = None,
+                 keep_focus: typing.Iterable[QtWidgets.QWidget] = ()):
+        """
+        :param list_view: shipment list view
+        :param map_view: shipment map view
+        :param item_position(row, column=None) -> QModelIndex: function for converting list and map positions
+        :param keep_focus: widgets which keep keyboard focus when list selection is synced, e.g. search field
+        """
+        super(SelectionCoordinator, self).__init__(parent)
+        self.list_view = list_view
+        self.map_view = map_view
+        self.item_position = item_position
+        self.keep_focus = tuple(keep_focus)
+        self.syncing = False            # re-entrance guard
+        self.source = None              # view which selection was changed last
+        self.sample = None              # last reported sample: (row, code)
+        self.timer = QtCore.QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(0)
+        self.timer.timeout.connect(self.flush)
+
+    def bind(self):
+        """ Connect to selection models of views. Call after views models were set """
+        self.list_view.selectionModel().selectionChanged.connect(lambda *args: self.schedule(self.list_view))
+        self.map_view.selectionModel().selectionChanged.connect(lambda *args: self.schedule(self.map_view))
+        self.invalidate()
+
+    def invalidate(self):
+        """ Force sample update on the next tick, e.g. after list was rebuilt """
+        self.sample = None
+        self.timer.start()
+
+    def refresh(self):
+        """ Check on the next tick if the selected sample was changed, e.g. after its code was edited """
+        self.timer.start()
+
+    def schedule(self, view: QtWidgets.QTableView):
+        """ Remember the last changed view and process the burst once on the next tick """
+        if self.syncing:
+            return
+        self.source = view
+        self.timer.start()
+
+    def flush(self):
+        """ Sync selection to the other view and report sample change """
+        source, self.source = self.source, None
+        self.syncing = True
+        try:
+            if source is self.map_view:
+                self.sync_list()
+            elif source is self.list_view:
+                self.sync_map()
+        finally:
+            self.syncing = False
+
+        selected = self.list_view.selectionModel().selectedRows()
+        row = selected[0].row() if selected else -1
+        sample = (row, selected[0].data() if selected else None)
+        if sample != self.sample:
+            self.sample = sample
+            self.sample_changed.emit(row)
+
+    def sync_list(self):
+        """ Select list item according to map selection """
+        if not (selected := self.map_view.selectionModel().selectedIndexes()):
+            self.list_view.clearSelection()
+            return
+        new_selection = self.item_position(selected[0].row(), selected[0].column())
+        if not new_selection.isValid():
+            self.list_view.clearSelection()
+            return
+        flags = QtCore.QItemSelectionModel.ClearAndSelect | QtCore.QItemSelectionModel.Rows
+        self.list_view.selectionModel().select(new_selection, flags)
+        self.list_view.scrollTo(new_selection)
+
+    def sync_map(self):
+        """ Select map item according to list selection """
+        if not (selected := self.list_view.selectionModel().selectedRows()):
+            self.map_view.clearSelection()
+            return
+        new_selection = self.item_position(selected[0].row())
+        self.map_view.selectionModel().select(new_selection, QtCore.QItemSelectionModel.ClearAndSelect)
+        self.map_view.scrollTo(new_selection)
+        # correct list current index
+        self.list_view.setCurrentIndex(self.list_view.model().index(selected[0].row(),
+                                                                    self.list_view.model().weight_column_index))
+        if QtWidgets.QApplication.focusWidget() not in self.keep_focus:
+            self.list_view.setFocus()
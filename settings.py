@@ -13,16 +13,31 @@ code_column = 'Код'
 weight_column = 'Weight'
 position_columns = ['st0', 'st1', 'st2', 'st3', 'st4']
 default_columns = (code_column, *position_columns, weight_column)
+position_dtype = 'int16'
 color_unpacked = (200, 10, 10, 70)      # RGBA background color for unpacked sample cell
 color_packed = (10, 200, 10, 70)        # RGBA background color for packed sample cell
 color_free = (10, 10, 200, 100)          # RGBA background color for free cell
 color_separator = (10, 10, 10, 100)      # RGBA background color for not available cell
+color_alarm = (230, 160, 0, 120)         # RGBA background color for box or sample with alarm
+
+virtual_map = True          # compute map cells on demand instead of storing the whole map
+map_row_height = 40         # fixed row height of the virtual map
+
+# workspace of open shipments
+workspace_memory_budget = 256 * 2 ** 20     # bytes of rebuildable caches (map, summary, index) kept in memory
+short_str_size = 56                         # approximate size of short string object, bytes
 
 move_step = (1, default_box_options['columns'])             # default steps for rows moving: SHIFT, ALT
 insert_many = default_box_options['columns']                # default rows amount for multi-insertion
 
 # export parameters
 column_width = 16
+audit_sheet_name = 'Audit'
+audit_columns = ['Sample', 'First row', 'Last row', 'Tubes', 'Expected tubes']
+# flat per-sample export for label printers and LIMS
+stream_export_columns = ('code', 'box', 'row', 'column', 'weight')
+stream_export_chunk = 10000         # list rows processed at once
+label_template = '^XA^FO20,20^A0N,40,40^FD{code}^FS^FO20,70^A0N,30,30^FD{box} {column}{row}^FS^XZ\n'
 # export Excel styles
 export_style_border = {
     'border': 1,
@@ -45,7 +60,36 @@ export_style_cells = {
     'text_wrap': True,
 }
 
+input_source = 'voice'      # weights input source: 'voice' or 'scale'
+
+# digital scale parameters
+scale_port = 'COM3'
+scale_baudrate = 9600
+scale_timeout = 0.5             # serial read timeout, sec
+scale_retry_delay = 2.0         # pause before reopening the port after failure, sec
+scale_stable_count = 3          # amount of consecutive close readings to consider weight stable
+scale_tolerance = 0.002         # max spread of stable readings
+scale_zero_threshold = 0.001    # readings below are considered as unloaded scale
+scale_precision = 3             # digits after the decimal point
+scale_unstable_marker = b'US'   # scale output marks unstable readings with this
+
+# read-only progress dashboard for supervisors
+dashboard_enabled = False
+dashboard_host = '127.0.0.1'    # use '0.0.0.0' to share with LAN
+dashboard_port = 8765
+dashboard_queue_size = 256      # max pending updates per viewer, slow viewers are disconnected
+
 use_model = 'model-ru'
+default_model_sample_rate = 16000     # used if model config does not specify it
+audio_block_ms = 100            # duration of audio block passed from input stream
+
+# voice activity gate: silence between samples is not passed to recognizer
+vad_enabled = True
+vad_pre_roll_ms = 300           # audio kept before speech onset
+vad_post_roll_ms = 600          # audio passed after speech end
+vad_threshold = 3.0             # speech energy to noise floor ratio
+vad_min_rms = 150               # min speech energy (int16 RMS)
+vad_noise_adaptation = 0.05     # noise floor adaptation rate
 
 acceptable_words = {
     'ноль':         '0',
@@ -68,6 +112,8 @@ acceptable_words = {
     'утка':         'Не надо недооценивать силу утки!',
 }
 
+search_command = 'найти'        # followed by sample code digits
+
 acceptable_commands = {
     'назад':    ItemSelection.PREVIOUS,
     'дальше':   ItemSelection.NEXT,
@@ -1,9 +1,13 @@
 import re
+import sys
+import typing
 import settings
+import numpy as np
 import pandas as pd
 from PyQt5 import QtWidgets, QtGui, QtCore
 from PyQt5.QtCore import Qt
-from additional import AbstractDataFrameModel, Direction, validate_selection, SampleInfo, ItemSelection
+from additional import AbstractDataFrameModel, Direction, validate_selection, SampleInfo, ItemSelection, \
+    missing_position, to_weights, parse_weights, format_weight, format_position
 
 
 # -------------------- QTableView --------------------
@@ -64,16 +68,13 @@ class ShipmentListView(QtWidgets.QTableView):
             end_pos = data.iloc[-1][settings.position_columns].values
 
         if not sample_number:
-            return SampleInfo(sample_code, '.'.join(current_pos.astype('str')), '.'.join(end_pos.astype('str')), True)
+            return SampleInfo(sample_code, '.'.join(map(format_position, current_pos)),
+                              '.'.join(map(format_position, end_pos)), True)
 
-        # continuity check
-        try:
-            real_sample_size = end_pos[4] - start_pos[4] + 1 + \
-                (end_pos[3] - start_pos[3]) * settings.default_box_options.get('columns')
-        except TypeError:
-            real_sample_size = 1
-        alarm = real_sample_size != data.shape[0]
-        return SampleInfo(sample_code, '.'.join(current_pos.astype('str')), '.'.join(end_pos.astype('str')), alarm)
+        # continuity check is done by shipment audit
+        alarm = self.model().has_alarm(selected.row())
+        return SampleInfo(sample_code, '.'.join(map(format_position, current_pos)),
+                          '.'.join(map(format_position, end_pos)), alarm)
 
     @validate_selection()
     def move_row(self, direction: Direction, modifiers=QtWidgets.QApplication.keyboardModifiers(), *,
@@ -137,8 +138,31 @@ class ShipmentListView(QtWidgets.QTableView):
 
 
 # -------------------- QAbstractTableModel --------------------
+def apply_schema(df: pd.DataFrame) -> pd.DataFrame:
+    """ Convert shipment list columns to compact types: code strings, small int positions
+        (missing_position for free rows) and float64 weights (NaN if not weighed) """
+    df = df.copy()
+    if settings.code_column in df.columns:
+        df[settings.code_column] = df[settings.code_column].fillna('').astype('str').astype('object')
+    for column in df.columns.intersection(settings.position_columns):
+        if df[column].dtype != settings.position_dtype:
+            df[column] = pd.to_numeric(df[column], errors='coerce').fillna(missing_position)\
+                .astype(settings.position_dtype)
+    if settings.weight_column in df.columns and df[settings.weight_column].dtype != 'float64':
+        df[settings.weight_column] = to_weights(df[settings.weight_column])
+    return df
+
+
 class ShipmentListModel(AbstractDataFrameModel):
-    """ Model for shipment list """
+    """ Model for shipment list. Columns are kept typed, values are formatted for display only here """
+    def __init__(self, df: pd.DataFrame):
+        super(ShipmentListModel, self).__init__(apply_schema(df))
+        self.alarms = np.zeros(self._df.shape[0], dtype='bool')       # rows of broken samples, set by audit
+
+    def has_alarm(self, row: int) -> bool:
+        """ Check if row belongs to broken sample """
+        return (row < self.alarms.size) and bool(self.alarms[row])
+
     def flags(self, index: QtCore.QModelIndex) -> Qt.ItemFlags:
         flags = Qt.ItemIsEnabled | Qt.ItemIsSelectable
         if (index.column() == self.code_column_index) or \
@@ -151,12 +175,47 @@ class ShipmentListModel(AbstractDataFrameModel):
         if not index.isValid():
             return
         elif (role == Qt.DisplayRole) or (role == Qt.EditRole):
-            return str(self._df.iloc[index.row(), index.column()])
+            value = self._df.iat[index.row(), index.column()]
+            if index.column() == self.weight_column_index:
+                return format_weight(value)
+            elif self._df.columns[index.column()] in settings.position_columns:
+                return format_position(value)
+            return str(value)
         elif role == Qt.TextAlignmentRole:        # for first column in list set left text alignment
             return Qt.AlignVCenter if index.column() == 0 else Qt.AlignCenter
+        elif (role == Qt.BackgroundColorRole) and self.has_alarm(index.row()):
+            return QtGui.QColor(*settings.color_alarm)
         # if role == Qt.FontRole:
         #     return QFont('Courier New')
 
+    def setData(self, index: QtCore.QModelIndex, value: typing.Any, role: int = ...) -> bool:
+        """ Parse edited value to column type """
+        if index.isValid() and (index.column() == self.weight_column_index):
+            weights, invalid = parse_weights([value])
+            if invalid[0]:          # not a number was entered
+                return False
+            value = weights[0]
+        elif index.isValid() and (index.column() == self.code_column_index):
+            value = sys.intern(str(value))
+        return super(ShipmentListModel, self).setData(index, value, role)
+
+    def setDataRange(self, rows: np.ndarray, columns: np.ndarray, values: np.ndarray, role: int = Qt.EditRole) -> bool:
+        """ Parse weight values to column type """
+        values = np.asarray(values, dtype='object')
+        weights = columns == self.weight_column_index
+        if weights.any():
+            values = values.copy()
+            values[weights] = to_weights(values[weights])
+        return super(ShipmentListModel, self).setDataRange(rows, columns, values, role)
+
+    @property
+    def df(self):
+        return self._df
+
+    @df.setter
+    def df(self, value):
+        AbstractDataFrameModel.df.fset(self, apply_schema(value))
+
     @property
     def weight_column_index(self):
         """ Return index of column named settings.weight_column """
@@ -1,44 +1,59 @@
 import settings
 import typing
+import numpy as np
 import pandas as pd
 from PyQt5 import QtWidgets, QtCore, QtGui
 from PyQt5.Qt import Qt
-from additional import AbstractDataFrameModel, range_generator, PositionStatus
+from additional import AbstractDataFrameModel, BoxOptions, range_generator, PositionStatus, format_weight
 
 
 # -------------------- QTableView --------------------
 class ShipmentMapView(QtWidgets.QTableView):
+    def setModel(self, model: QtCore.QAbstractItemModel) -> None:
+        super(ShipmentMapView, self).setModel(model)
+        # virtual map has uniform rows: skip per-row height bookkeeping
+        if getattr(model, 'virtual', False):
+            self.verticalHeader().setSectionResizeMode(QtWidgets.QHeaderView.Fixed)
+            self.verticalHeader().setDefaultSectionSize(settings.map_row_height)
+
     def selectionCommand(self, index: QtCore.QModelIndex, event: typing.Optional[QtCore.QEvent] = ...) \
             -> QtCore.QItemSelectionModel.SelectionFlags:
         if not index.isValid():
             return super(ShipmentMapView, self).selectionCommand(index, event)
         pos_status = self.model().position_status_func(index)
-        if (pos_status == PositionStatus.PACKED_SAMPLE) or (pos_status == PositionStatus.UNPACKED_SAMPLE):
+        if pos_status in (PositionStatus.PACKED_SAMPLE, PositionStatus.UNPACKED_SAMPLE, PositionStatus.ALARM_SAMPLE):
             return super(ShipmentMapView, self).selectionCommand(index, event)
         else:
             return QtCore.QItemSelectionModel.SelectionFlags(QtCore.QItemSelectionModel.Deselect)
 
     def dataChanged(self, topLeft: QtCore.QModelIndex, bottomRight: QtCore.QModelIndex,
                     roles: typing.Iterable[int] = ...) -> None:
-        for row in range_generator(topLeft.row(), bottomRight.row() + 1):
-            self.resizeRowToContents(row)
+        if not getattr(self.model(), 'virtual', False):
+            for row in range_generator(topLeft.row(), bottomRight.row() + 1):
+                self.resizeRowToContents(row)
         super(ShipmentMapView, self).dataChanged(topLeft, bottomRight, roles)
 
 
 # -------------------- QAbstractTableModel --------------------
 class ShipmentMapModel(AbstractDataFrameModel):
     """ Model for shipment map """
+    virtual = False
+
     def __init__(self, df: pd.DataFrame, position_status_func: typing.Callable):
         """ :param index_validate(index: QModelIndex) -> bool
                 function for validating indexes according to ListModel """
         super(ShipmentMapModel, self).__init__(df)
         self.position_status_func = position_status_func
 
+    def cell_value(self, index: QtCore.QModelIndex) -> str:
+        """ Return text of the map cell """
+        return str(self._df.iloc[index.row(), index.column()])
+
     def data(self, index: QtCore.QModelIndex, role=Qt.DisplayRole):
         if not index.isValid():
             return
         if role == Qt.DisplayRole:
-            return str(self._df.iloc[index.row(), index.column()])
+            return self.cell_value(index)
         elif role == Qt.TextAlignmentRole:
             return Qt.AlignCenter
         elif role == Qt.TextWordWrap:
@@ -53,5 +68,75 @@ class ShipmentMapModel(AbstractDataFrameModel):
                 return QtGui.QColor(*settings.color_free)
             elif pos_status == PositionStatus.SEPARATOR:
                 return QtGui.QColor(*settings.color_separator)
+            elif pos_status == PositionStatus.ALARM_SAMPLE:
+                return QtGui.QColor(*settings.color_alarm)
         # if role == Qt.FontRole:
         #     return QFont('Courier New')
+
+
+class VirtualShipmentMapModel(ShipmentMapModel):
+    """ Virtualized model for shipment map.
+        Nothing but column names is stored: cells, box headers and separators are computed on demand
+        from the list model and box geometry, so memory does not depend on the shipment size """
+    virtual = True
+
+    def __init__(self, list_model: QtCore.QAbstractTableModel, box_options: BoxOptions, columns: typing.Sequence,
+                 position_status_func: typing.Callable):
+        """ :param list_model
+                source shipment list model
+            :param box_options
+                box geometry
+            :param columns
+                map column names
+            :param position_status_func(index: QModelIndex) -> PositionStatus
+                function for determining map cell status """
+        super(VirtualShipmentMapModel, self).__init__(pd.DataFrame(columns=columns), position_status_func)
+        self.list_model = list_model
+        self.box_options = box_options
+
+    @property
+    def box_height(self) -> int:
+        """ Return amount of map rows per box including separator """
+        return self.box_options.rows + self.box_options.separator
+
+    def rowCount(self, parent=None):
+        box_capacity = self.box_options.rows * self.box_options.columns
+        return int(np.ceil(self.list_model.rowCount() / box_capacity)) * self.box_height
+
+    def headerData(self, section: int, orientation: Qt.Orientation, role: int = ...):
+        if (role == Qt.DisplayRole) and (orientation == Qt.Vertical):
+            row_in_box = section % self.box_height
+            return str(row_in_box + 1) if row_in_box < self.box_options.rows else ''
+        return super(VirtualShipmentMapModel, self).headerData(section, orientation, role)
+
+    def cell_value(self, index: QtCore.QModelIndex) -> str:
+        row_in_box = index.row() % self.box_height
+        if row_in_box >= self.box_options.rows:
+            return ''
+        row = (index.row() // self.box_height * self.box_options.rows + row_in_box) * self.box_options.columns + \
+            index.column()
+        if row >= self.list_model.rowCount():
+            return ''
+        df = self.list_model.df
+        code = df.iat[row, self.list_model.code_column_index]
+        weight = df.iat[row, self.list_model.weight_column_index]
+        return str(code) if np.isnan(weight) else f'{code} {format_weight(weight)}'
+
+    def setData(self, index: QtCore.QModelIndex, value: typing.Any, role: int = ...) -> bool:
+        """ Values are read from the list model, so just notify the views """
+        if not index.isValid() or role != Qt.EditRole:
+            return False
+        self.dataChanged.emit(index, index, [Qt.DisplayRole])
+        return True
+
+    def setDataRange(self, rows: np.ndarray, columns: np.ndarray, values: np.ndarray, role: int = Qt.EditRole) -> bool:
+        """ Values are read from the list model, so just notify the views """
+        if role != Qt.EditRole or not rows.size:
+            return False
+        self.emit_rows_changed(rows, columns.min(), columns.max())
+        return True
+
+    def refresh(self):
+        """ Notify views that the map geometry was changed """
+        self.beginResetModel()
+        self.endResetModel()
@@ -1,12 +1,19 @@
 import settings
+import sys
+import typing
 import pandas as pd
 import numpy as np
+import native_format
 from string import ascii_lowercase
 from PyQt5 import QtCore
 from PyQt5.Qt import Qt
-from additional import BoxOptions, range_generator, PositionStatus
+from additional import BoxOptions, AuditResult, LayoutPlan, range_generator, PositionStatus, parse_weights, \
+    format_weight, missing_position
 from shipment_list import ShipmentListModel
-from shipment_map import ShipmentMapModel
+from shipment_map import ShipmentMapModel, VirtualShipmentMapModel
+from box_navigator import BoxSummary, BoxNavigatorModel
+from sample_search import SampleIndex
+from box_planner import plan_layout
 
 
 class ShipmentModel:
@@ -25,10 +32,41 @@ class ShipmentModel:
         self.map_columns = kwargs.get('map_columns', list(ascii_lowercase[:self.box_options.columns]))
 
         self.list_model = ShipmentListModel(df)
-        self.map_model = ShipmentMapModel(self.list_to_map(), self.get_position_status)
+        if kwargs.get('virtual_map', settings.virtual_map):
+            self.map_model = VirtualShipmentMapModel(self.list_model, self.box_options, self.map_columns,
+                                                     self.get_position_status)
+        else:
+            self.map_model = ShipmentMapModel(self.list_to_map(), self.get_position_status)
         self.list_model.dataChanged.connect(self.update_map_value)
+        if self.map_model.virtual:      # virtual map geometry follows list structure changes
+            self.list_model.modelReset.connect(self.map_model.refresh)
+
+        # per-box summary for navigator
+        self.box_summary = BoxSummary(self.box_options.rows * self.box_options.columns)
+        self.box_summary.rebuild(self.list_model.df)
+        self.navigator_model = BoxNavigatorModel(self.box_summary)
+        self.list_model.dataChanged.connect(self.update_box_summary)
+        # code search index
+        self.sample_index = SampleIndex()
+        self.sample_index.rebuild(self.list_model.df[settings.code_column])
+        self.list_model.dataChanged.connect(self.update_sample_index)
+        # continuity audit, uses sample numbers collected by box summary
+        self.audit_result = self.audit()
+        self.list_model.alarms = self.audit_result.alarms
+        self.list_model.dataChanged.connect(self.update_audit)
+
+        self._number = ''
+        self.evicted = False        # caches were dropped by workspace
+
+    @property
+    def number(self):
+        return self._number
 
-        self.number = ''
+    @number.setter
+    def number(self, value):
+        self._number = value
+        self.navigator_model.number = value
+        self.navigator_model.update_boxes(range(len(self.box_summary)))
 
     def update_map_value(self, first_index: QtCore.QModelIndex, last_index: QtCore.QModelIndex):
         """ Update shipment map cell value according to list item at index.
@@ -37,14 +75,20 @@ class ShipmentModel:
         start_map_index = self.item_position(first_index.row())
         # end_map_index = self.item_position(last_index.row())
 
-        if first_index == last_index:
-            # collect value
-            weight = self.list_model.df.loc[first_index.row(), settings.weight_column]
-            code = self.list_model.df.loc[first_index.row(), settings.code_column]
-            value = f'{code} {weight}' if weight else code
+        if (first_index == last_index) and first_index.isValid():
+            value = self.map_values(np.array([first_index.row()]))[0]
             self.map_model.setData(start_map_index, value, Qt.EditRole)
+        elif (first_index.row() <= 0) and (last_index.row() == self.list_model.rowCount() - 1):     # or empty list
+            if self.map_model.virtual:      # geometry is refreshed by list reset hook, just repaint values
+                self.map_model.dataChanged.emit(self.map_model.index(0, 0),
+                                                self.map_model.index(self.map_model.rowCount() - 1,
+                                                                     self.map_model.columnCount() - 1),
+                                                [Qt.DisplayRole])
+            else:
+                self.rebuild_map()
         else:
-            self.map_model.df = self.list_to_map()
+            rows = np.arange(first_index.row(), last_index.row() + 1)
+            self.map_model.setDataRange(*self.map_positions(rows), self.map_values(rows), Qt.EditRole)
 
         # это бесполезно до тех пор, пока у меня move/insert/remove изменяют целиком df
         # if not start_map_index.isValid() or not end_map_index.isValid():
@@ -65,13 +109,149 @@ class ShipmentModel:
         # else:
         #     self.map_model.df = self.list_to_map()
 
+    def update_box_summary(self, first_index: QtCore.QModelIndex, last_index: QtCore.QModelIndex):
+        """ Update per-box summary for changed list rows. Rebuild it if the whole list was changed """
+        rows = self.list_model.rowCount()
+        if (not first_index.isValid()) or (self.box_summary.rows != rows) or \
+                ((first_index.row() == 0) and (last_index.row() == rows - 1) and (first_index != last_index)):
+            self.box_summary.rebuild(self.list_model.df)
+            self.navigator_model.refresh()
+        else:
+            boxes = self.box_summary.update_rows(self.list_model.df, first_index.row(), last_index.row())
+            self.navigator_model.update_boxes(boxes)
+
+    def update_sample_index(self, first_index: QtCore.QModelIndex, last_index: QtCore.QModelIndex):
+        """ Update code search index for changed list rows. Rebuild it if the whole list was changed """
+        rows = self.list_model.rowCount()
+        codes = self.list_model.df[settings.code_column]
+        if (not first_index.isValid()) or (len(self.sample_index) != rows) or \
+                ((first_index.row() == 0) and (last_index.row() == rows - 1) and (first_index != last_index)):
+            self.sample_index.rebuild(codes)
+        elif first_index.column() <= self.list_model.code_column_index <= last_index.column():
+            self.sample_index.update_rows(codes.iloc[first_index.row():last_index.row() + 1], first_index.row())
+
+    def audit(self) -> AuditResult:
+        """ Check continuity of all samples at once: tubes of a sample must follow each other in list
+            and their amount must match the source positions range """
+        numbers, _ = pd.factorize(self.box_summary.numbers)         # -1 for codes without number
+        rows = np.flatnonzero(numbers >= 0)
+        if not rows.size:
+            return AuditResult(np.zeros(numbers.size, dtype='bool'), pd.DataFrame(columns=settings.audit_columns))
+        # group rows by sample
+        order = rows[np.argsort(numbers[rows], kind='stable')]
+        groups = numbers[order]
+        starts = np.flatnonzero(np.diff(groups, prepend=-1))
+        sizes = np.diff(np.append(starts, order.size))
+        first_rows, last_rows = order[starts], order[starts + sizes - 1]
+        # expected size according to positions of the first and the last tube
+        position_row = self.list_model.df[settings.position_columns[3]].to_numpy(dtype='int64')
+        position_col = self.list_model.df[settings.position_columns[4]].to_numpy(dtype='int64')
+        expected = position_col[last_rows] - position_col[first_rows] + 1 + \
+            (position_row[last_rows] - position_row[first_rows]) * self.box_options.columns
+        broken = (expected != sizes) | (last_rows - first_rows + 1 != sizes)
+
+        alarms = np.zeros(numbers.size, dtype='bool')
+        alarms[order] = np.repeat(broken, sizes)
+        report = pd.DataFrame(zip(self.box_summary.numbers[first_rows[broken]], first_rows[broken] + 1,
+                                  last_rows[broken] + 1, sizes[broken], expected[broken]),
+                              columns=settings.audit_columns)
+        return AuditResult(alarms, report)
+
+    def update_audit(self, first_index: QtCore.QModelIndex, last_index: QtCore.QModelIndex):
+        """ Repeat audit if list structure or codes were changed """
+        if (self.audit_result.alarms.size == self.list_model.rowCount()) and \
+                (first_index.column() > self.list_model.code_column_index):
+            return
+        previous = self.audit_result.alarms
+        self.audit_result = self.audit()
+        self.list_model.alarms = self.audit_result.alarms
+        # highlight changed rows
+        if previous.size == self.audit_result.alarms.size:
+            changed = np.flatnonzero(previous != self.audit_result.alarms)
+            if changed.size:
+                self.list_model.emit_rows_changed(changed, 0, self.list_model.columnCount() - 1, Qt.BackgroundColorRole)
+                self.map_model.emit_rows_changed(self.map_positions(changed)[0], 0, self.map_model.columnCount() - 1,
+                                                 Qt.BackgroundColorRole)
+
+    def progress(self) -> dict:
+        """ Return packing progress summary: packed and total samples, counters of each box and broken samples """
+        return {'number': self.number,
+                'packed': int(self.box_summary.packed.sum()),
+                'total': int(self.box_summary.samples.sum()),
+                'boxes': np.stack((self.box_summary.packed, self.box_summary.samples), axis=1).tolist(),
+                'alarms': int(self.audit_result.report.shape[0])}
+
+    def find_sample(self, prefix: str, after: int = -1) -> QtCore.QModelIndex:
+        """ Get list index of the next item with code starting with prefix """
+        if len(self.sample_index) != self.list_model.rowCount():        # index was evicted
+            self.sample_index.rebuild(self.list_model.df[settings.code_column])
+        return self.list_model.index(self.sample_index.find(prefix, after), 0)
+
+    def plan_layout(self) -> LayoutPlan:
+        """ Plan list order and free rows, so samples do not span boxes """
+        samples = self.list_model.df[settings.code_column].astype('str').to_numpy(dtype='object') != ''
+        return plan_layout(self.box_summary.numbers, samples, self.box_options)
+
+    def apply_layout(self, plan: LayoutPlan):
+        """ Reorder list according to layout plan and insert free rows at once """
+        free = plan.order < 0
+        df = self.list_model.df.iloc[np.where(free, 0, plan.order)].reset_index(drop=True)
+        df.loc[free, settings.code_column] = ''
+        df.loc[free, settings.position_columns] = missing_position
+        df.loc[free, settings.weight_column] = np.nan
+        self.list_model.df = df
+
+    def cache_memory(self) -> int:
+        """ Return memory used by state which can be rebuilt from the list, bytes """
+        memory = self.box_summary.nbytes + self.sample_index.nbytes + self.audit_result.alarms.nbytes
+        if not self.map_model.virtual:
+            memory += int(self.map_model.df.memory_usage(deep=True).sum())
+        return memory
+
+    def evict(self):
+        """ Drop map frame, box summary, search index and audit. Edit state (list and number) is kept """
+        if self.evicted:
+            return
+        self.evicted = True
+        if not self.map_model.virtual:
+            self.map_model.df = pd.DataFrame(columns=self.map_columns)
+        self.box_summary.clear()
+        self.navigator_model.refresh()
+        self.sample_index.clear()
+        self.audit_result = AuditResult(np.zeros(0, dtype='bool'), pd.DataFrame(columns=settings.audit_columns))
+        self.list_model.alarms = self.audit_result.alarms
+
+    def restore(self):
+        """ Rebuild evicted state. Search index is rebuilt on the first search or list change """
+        if not self.evicted:
+            return
+        self.evicted = False
+        self.box_summary.rebuild(self.list_model.df)
+        self.navigator_model.refresh()
+        self.audit_result = self.audit()
+        self.list_model.alarms = self.audit_result.alarms
+        self.rebuild_map()
+
+    def box_first_item(self, box: int) -> QtCore.QModelIndex:
+        """ Get list index of the first item in box """
+        return self.item_position(box * (self.box_options.rows + self.box_options.separator), 0)
+
+    def rebuild_map(self):
+        """ Rebuild whole shipment map according to list """
+        if self.map_model.virtual:
+            self.map_model.refresh()
+        else:
+            self.map_model.df = self.list_to_map()
+
     def get_position_status(self, map_index: QtCore.QModelIndex) -> PositionStatus:
         """ Determine whether index refers to sample, free box place or separator """
         list_index = self.item_position(map_index.row(), map_index.column())
         if list_index.isValid():
-            weight = self.list_model.df.iloc[list_index.row(), self.list_model.weight_column_index]
-            return PositionStatus.PACKED_SAMPLE if weight else PositionStatus.UNPACKED_SAMPLE
-        elif self.map_model.df.index[map_index.row()] != '':
+            if self.list_model.has_alarm(list_index.row()):
+                return PositionStatus.ALARM_SAMPLE
+            weight = self.list_model.df.iat[list_index.row(), self.list_model.weight_column_index]
+            return PositionStatus.UNPACKED_SAMPLE if np.isnan(weight) else PositionStatus.PACKED_SAMPLE
+        elif map_index.row() % (self.box_options.rows + self.box_options.separator) < self.box_options.rows:
             return PositionStatus.FREE
         else:
             return PositionStatus.SEPARATOR
@@ -90,12 +270,47 @@ class ShipmentModel:
             col_in_map = row % self.box_options.columns
             return self.map_model.index(row_in_map, col_in_map)
 
+    def map_positions(self, rows: np.ndarray):
+        """ Get map rows and columns of list items by their indexes in list """
+        box_capacity = self.box_options.rows * self.box_options.columns
+        map_rows = rows // self.box_options.columns + self.box_options.separator * (rows // box_capacity)
+        return map_rows, rows % self.box_options.columns
+
+    def map_values(self, rows: np.ndarray) -> np.ndarray:
+        """ Get map cell values of list items by their indexes in list """
+        samples = self.list_model.df[settings.code_column].iloc[rows].astype('str')
+        weights = self.list_model.df[settings.weight_column].iloc[rows]
+        weight_exists = weights.notna()
+        samples.loc[weight_exists] += ' ' + weights.loc[weight_exists].map(format_weight).astype('object')
+        return samples.to_numpy(dtype='object')
+
     def set_weight(self, index: int, weight: str):
         """ Set weight to item by its index in list """
         # create QModelIndex
         list_index = self.list_model.index(index, self.list_model.weight_column_index)
         self.list_model.setData(list_index, weight, Qt.EditRole)
 
+    def set_weights(self, rows: typing.Iterable[int], weights: typing.Iterable):
+        """ Set weights to many items by their indexes in list at once.
+            Emits one dataChanged per contiguous block of rows. Nothing is set if some weight is not a number """
+        rows = np.fromiter(rows, dtype='int64')
+        weights, invalid = parse_weights(list(weights))
+        if rows.size != weights.size:
+            raise ValueError('Rows and weights must have the same length.')
+        if invalid.any():
+            raise ValueError(f'Weights of rows {rows[invalid].tolist()} are not numbers.')
+        if rows.size and ((rows.min() < 0) or (rows.max() >= self.list_model.rowCount())):
+            raise IndexError('Row index is out of shipment list range.')
+        # keep the last weight if row is repeated
+        rows, last = np.unique(rows[::-1], return_index=True)
+        weights = weights[::-1][last]
+        columns = np.full(rows.size, self.list_model.weight_column_index)
+        self.list_model.setDataRange(rows, columns, weights, Qt.EditRole)
+
+    def set_weight_range(self, start: int, weights: typing.Sequence):
+        """ Set weights to contiguous items starting from index in list """
+        self.set_weights(range(start, start + len(weights)), weights)
+
     @property
     def box_amount(self):
         """ Return amount of required boxes """
@@ -135,16 +350,11 @@ class ShipmentModel:
 
     def list_to_map(self, export_mode=False) -> pd.DataFrame:
         """ Convert samples list (Series) to shipment map (DataFrame) """
-        samples = self.list_model.df[settings.code_column].copy()
-        if not samples.size:
+        if not self.list_model.rowCount():
             return pd.DataFrame(columns=self.map_columns)
-        weights = self.list_model.df[settings.weight_column]
-        weight_exists = weights != ''
-        samples.loc[weight_exists] += ' ' + weights.loc[weight_exists]
-        del weights
+        samples = self.map_values(np.arange(self.list_model.rowCount()))
 
         # fill list with zeroes to full boxes
-        samples = samples.values
         box_capacity = self.box_options.rows * self.box_options.columns
         if (delta_size := (box_capacity - samples.size % box_capacity) % box_capacity) > 0:
             samples = np.append(samples, [''] * delta_size)
@@ -176,20 +386,45 @@ class ShipmentModel:
 
         return pd.DataFrame(map_data, columns=self.map_columns, index=index)
 
-    def load(self, df: pd.DataFrame):
+    def load(self, df: pd.DataFrame, keep_weights: bool = False):
         """ Load shipment list from DataFrame and build shipment map """
         # if target columns was not found --> exit
-        if any([col not in df.columns for col in self.columns if col != settings.weight_column]):
+        if any([col not in df.columns for col in self.columns if (col != settings.weight_column) or keep_weights]):
             return 'ERROR! Cannot find one or more required columns in selected file!'
-        df[settings.weight_column] = ''
+        if not keep_weights:
+            df[settings.weight_column] = np.nan
+        df[settings.code_column] = [sys.intern(str(code)) for code in df[settings.code_column].fillna('')]
         self.list_model.df = df[self.columns]
 
-    def save(self, filepath):
+    def load_native(self, filepath):
+        """ Load shipment list with weights and number from native shipment file """
+        try:
+            df, meta = native_format.load(filepath)
+        except (OSError, ValueError, KeyError, IndexError, TypeError) as e:     # damaged or truncated file
+            return f'ERROR! Cannot load shipment file: {e}'
+        if error := self.load(df, keep_weights=True):
+            return error
+        self.number = meta.get('number', '')
+        if BoxOptions(**meta.get('box_options', self.box_options._asdict())) != self.box_options:
+            return 'WARNING! Shipment was saved with other box options.'
+
+    def save_native(self, filepath):
+        """ Save shipment list with weights and number to native shipment file """
+        native_format.save(filepath, self.list_model.df, number=self.number, box_options=self.box_options._asdict())
+
+    def save(self, filepath, report: pd.DataFrame = None):
+        """ Save shipment map to Excel file. Broken samples are listed on audit sheet
+            :param report
+                audit report if it was already computed """
         sheet_name = f'Map {self.number}'
 
         writer = pd.ExcelWriter(filepath, engine='xlsxwriter')      # xlsxwriter supports Excel formats
         data = self.list_to_map(export_mode=True).reset_index()
         data.to_excel(writer, sheet_name=sheet_name, index=False, header=False)
+        # annotate export with broken samples
+        report = self.audit().report if report is None else report
+        if not report.empty:
+            report.to_excel(writer, sheet_name=settings.audit_sheet_name, index=False)
         # create styles
         workbook = writer.book
         header_style = workbook.add_format(settings.export_style_headers)
@@ -0,0 +1,112 @@
+import settings
+import pathlib
+import re
+import typing
+import pandas as pd
+from collections import OrderedDict
+import native_format
+from shipment_model import ShipmentModel
+
+
+class WorkspaceEntry:
+    """ Shipment opened in workspace. Shipment model is created from file on the first activation """
+    def __init__(self, filepath: typing.Optional[str] = None):
+        """ :param filepath
+                Excel or native shipment file, new empty shipment if not specified """
+        self.filepath = filepath
+        self.shipment = None if filepath else ShipmentModel()
+        self.selected_row = 0           # selection restored when entry becomes active
+        self.message = None             # load error or warning
+
+    @property
+    def loaded(self) -> bool:
+        return self.shipment is not None
+
+    @property
+    def blank(self) -> bool:
+        """ New shipment without data """
+        return self.loaded and not self.filepath and not self.shipment.number and \
+            not self.shipment.list_model.rowCount()
+
+    @property
+    def title(self) -> str:
+        """ Return tab title: shipment number or file name """
+        if self.loaded and self.shipment.number:
+            return self.shipment.number
+        return pathlib.Path(self.filepath).stem if self.filepath else 'New shipment'
+
+    def load(self):
+        """ Create shipment model from Excel or native shipment file. If the file cannot be read,
+            shipment stays empty and the error is kept in message """
+        self.shipment = ShipmentModel()
+        if self.filepath.endswith(native_format.extension):
+            self.message = self.shipment.load_native(self.filepath)
+        else:
+            try:
+                df = pd.read_excel(self.filepath)
+            except Exception as e:      # file was moved, locked or damaged after it was picked; parsers vary
+                self.message = f'ERROR! Cannot read "{self.filepath}": {e}'
+                return
+            self.message = self.shipment.load(df)
+            # get shipment number from path
+            num = re.search(r'\d+', pathlib.Path(self.filepath).name)
+            self.shipment.number = num.group(0) if num else ''
+
+
+class ShipmentWorkspace:
+    """ Open shipments. Inactive shipments keep their edit state, while their caches (map frame, box summary,
+        search index) are evicted in least recently used order when the memory budget is exceeded """
+    def __init__(self, memory_budget: int = settings.workspace_memory_budget):
+        self.memory_budget = memory_budget
+        self.entries = []
+        self.active = None
+        self._warm = OrderedDict()      # entries with caches by id, least recently used first
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __getitem__(self, index: int) -> WorkspaceEntry:
+        return self.entries[index]
+
+    def add(self, entry: WorkspaceEntry) -> int:
+        """ Add entry without loading it. Returns its index """
+        self.entries.append(entry)
+        return len(self.entries) - 1
+
+    def remove(self, index: int) -> WorkspaceEntry:
+        """ Close entry at index """
+        entry = self.entries.pop(index)
+        self._warm.pop(id(entry), None)
+        if entry is self.active:
+            self.active = None
+        return entry
+
+    def activate(self, index: int) -> WorkspaceEntry:
+        """ Make entry at index active: load it on the first activation or restore its evicted caches """
+        entry = self.entries[index]
+        if not entry.loaded:
+            entry.load()
+        else:
+            entry.shipment.restore()
+        self._warm[id(entry)] = entry
+        self._warm.move_to_end(id(entry))
+        self.active = entry
+        self.trim()
+        return entry
+
+    def cache_memory(self) -> int:
+        """ Return memory used by caches of all warm shipments, bytes """
+        return sum(entry.shipment.cache_memory() for entry in self._warm.values())
+
+    def trim(self):
+        """ Evict caches of the least recently used inactive shipments until they fit the memory budget """
+        memory = {key: entry.shipment.cache_memory() for key, entry in self._warm.items()}
+        total = sum(memory.values())
+        for key, entry in list(self._warm.items()):
+            if total <= self.memory_budget:
+                break
+            if entry is self.active:
+                continue
+            entry.shipment.evict()
+            total -= memory[key]
+            del self._warm[key]
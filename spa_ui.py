@@ -1,27 +1,32 @@
 import settings
 import pathlib
-import re
 import sys
-import pandas as pd
 from functools import partial
 
 from PyQt5 import QtWidgets, uic, QtCore, QtGui
 from PyQt5.Qt import Qt
 from PyQt5.QtWidgets import QFileDialog, QHeaderView
 
-from additional import ItemSelection, validate_selection
+from additional import ItemSelection, SampleSearch, InputStatus, validate_selection
+import native_format
+import stream_export
 from shipment_list import ShipmentListView
-from shipment_model import ShipmentModel
+from box_navigator import BoxNavigatorView
+from selection_coordinator import SelectionCoordinator
+from dashboard_server import DashboardServer
+from shipment_workspace import ShipmentWorkspace, WorkspaceEntry
 from recognizer import Recognizer
+from scale_reader import ScaleReader
 
 
 class ShipmentPackingAssistantUI(QtWidgets.QMainWindow):
+    input_received = QtCore.pyqtSignal(object, bool)        # delivers input thread results to GUI thread
+
     def __init__(self):
         super(ShipmentPackingAssistantUI, self).__init__()
         uic.loadUi(pathlib.Path().joinpath('ui', 'spa2.ui'), self)
         # general settings
         self.font = QtGui.QFont('Courier New')
-        self.recursion_depth = 0
 
         # initialize components
         self.status_bar = self.findChild(QtWidgets.QStatusBar, 'status_bar')
@@ -38,6 +43,10 @@ class ShipmentPackingAssistantUI(QtWidgets.QMainWindow):
         self.alarm_label = self.findChild(QtWidgets.QLabel, 'alarm_label')
         self.insert_button = self.findChild(QtWidgets.QPushButton, 'insert_button')
         self.remove_button = self.findChild(QtWidgets.QPushButton, 'remove_button')
+        self.layout_button = self.findChild(QtWidgets.QPushButton, 'layout_button')
+        self.box_navigator = self.findChild(BoxNavigatorView, 'box_navigator')
+        self.search_edit = self.findChild(QtWidgets.QLineEdit, 'search_edit')
+        self.shipment_tabs = self.findChild(QtWidgets.QTabBar, 'shipment_tabs')
 
         # create insert popup
         self.insert_popup = QtWidgets.QMenu(self)
@@ -48,34 +57,59 @@ class ShipmentPackingAssistantUI(QtWidgets.QMainWindow):
 
         self.insert_popup.addAction(one_item_insert)
         self.insert_popup.addAction(multi_insert)
-        # initialize models for tables
-        self.shipment = ShipmentModel()
-        self.list_view.setModel(self.shipment.list_model)
-        self.map_view.setModel(self.shipment.map_model)
 
         # bind actions
         self.shipment_number.textChanged.connect(self.set_shipment_number)
         self.insert_button.clicked.connect(self.show_insert_popup)
         self.remove_button.clicked.connect(self.remove_action)
+        self.layout_button.clicked.connect(self.plan_action)
         self.import_button.clicked.connect(self.import_shipment)
         self.export_button.clicked.connect(self.export_map)
         self.work_button.clicked.connect(self.work_action)
+        self.search_edit.textEdited.connect(self.find_sample)
+        self.search_edit.returnPressed.connect(partial(self.find_sample, next_match=True))
+        self.shipment_tabs.currentChanged.connect(self.switch_shipment)
+        self.shipment_tabs.tabCloseRequested.connect(self.close_shipment)
 
         # bind events
-        self.list_view.selectionModel().selectionChanged.connect(self.back_selection)
-        self.map_view.selectionModel().selectionChanged.connect(self.back_selection)
-        self.list_view.selectionModel().selectionChanged.connect(self.update_ui_labels)
+        self.selection = SelectionCoordinator(self.list_view, self.map_view, None, self, keep_focus=(self.search_edit,))
+        self.selection.sample_changed.connect(self.update_ui_labels)
+        self.box_navigator.jump_to_box.connect(self.jump_to_box)
+
+        # progress dashboard
+        self.dashboard = None
+        dashboard_error = None
+        if settings.dashboard_enabled:
+            try:
+                self.dashboard = DashboardServer()
+                self.dashboard.start()
+            except OSError as e:
+                self.dashboard = None
+                dashboard_error = f'Dashboard is not available: {e}'
+
+        # open shipments, models of the active one are shown by views
+        self.workspace = ShipmentWorkspace()
+        self.add_shipment(WorkspaceEntry())
+        if dashboard_error:
+            self.status_bar.showMessage(dashboard_error)
         # self.list_view.setItemDelegate(ShipmentListDelegate())
 
         # setup components look - this takes too much resources
         # NOTE: IT MAY BE THE REASON OF UI LAGS
         self.list_view.verticalHeader().setDefaultSectionSize(20)
         self.list_view.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+        self.list_view.horizontalHeader().setResizeContentsPrecision(100)       # measured again on tab switch
         self.list_view.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
         self.map_view.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
         self.map_view.setFont(self.font)
+        self.box_navigator.verticalHeader().setDefaultSectionSize(20)
+        self.box_navigator.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
 
-        self.rec_thread = Recognizer(self.apply_rec_result)
+        self.input_received.connect(self.apply_rec_result)
+        if settings.input_source == 'scale':
+            self.rec_thread = ScaleReader(self.input_received.emit)
+        else:
+            self.rec_thread = Recognizer(self.input_received.emit)
         self.rec_thread.start()
         self.list_view.switch_selection.connect(self.select)
 
@@ -85,6 +119,79 @@ class ShipmentPackingAssistantUI(QtWidgets.QMainWindow):
     def __exit__(self, exc_type, exc_val, exc_tb):
         self.rec_thread.stop()
         self.rec_thread.join()
+        if self.dashboard:
+            self.dashboard.stop()
+
+    @property
+    def shipment(self):
+        """ Return active shipment model """
+        return self.workspace.active.shipment
+
+    def add_shipment(self, entry: WorkspaceEntry) -> int:
+        """ Add shipment tab. Shipment is loaded when the tab is activated for the first time """
+        index = self.workspace.add(entry)
+        self.shipment_tabs.addTab(entry.title)
+        if entry.filepath:
+            self.shipment_tabs.setTabToolTip(index, entry.filepath)
+        return index
+
+    def switch_shipment(self, index: int):
+        """ Show shipment of the tab: views, selection coordinator and per-shipment signals follow its models """
+        if (index < 0) or (self.workspace[index] is self.workspace.active):     # tab before active was closed
+            return
+        if previous := self.workspace.active:
+            selected = self.list_view.selectedIndexes()
+            previous.selected_row = selected[0].row() if selected else 0
+            self.disconnect_shipment(previous.shipment)
+        self.status_bar.showMessage(f'Opening shipment "{self.shipment_tabs.tabText(index)}"')
+        entry = self.workspace.activate(index)
+        self.connect_shipment(entry.shipment)
+        self.shipment_tabs.setTabText(index, entry.title)
+        self.list_view.selectRow(entry.selected_row)
+        if entry.message:
+            self.status_bar.showMessage(entry.message)
+            entry.message = None
+        elif broken := self.shipment.audit_result.report.shape[0]:
+            self.status_bar.showMessage(f'WARNING! {broken} samples do not match expected positions.')
+        else:
+            self.status_bar.clearMessage()
+
+    def connect_shipment(self, shipment):
+        """ Set shipment models to views and bind per-shipment signals """
+        self.list_view.setModel(shipment.list_model)
+        self.map_view.setModel(shipment.map_model)
+        self.box_navigator.setModel(shipment.navigator_model)
+        self.list_view.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        self.selection.item_position = shipment.item_position
+        self.selection.bind()
+        shipment.list_model.modelReset.connect(self.selection.invalidate)
+        shipment.list_model.dataChanged.connect(self.selection.refresh)
+        shipment.list_model.modelReset.connect(self.update_boxes_amount)
+        if self.dashboard:
+            shipment.list_model.dataChanged.connect(self.publish_progress)
+        self.shipment_number.setText(shipment.number)
+        self.update_boxes_amount()
+        self.publish_progress()
+
+    def disconnect_shipment(self, shipment):
+        """ Unbind per-shipment signals """
+        shipment.list_model.modelReset.disconnect(self.selection.invalidate)
+        shipment.list_model.dataChanged.disconnect(self.selection.refresh)
+        shipment.list_model.modelReset.disconnect(self.update_boxes_amount)
+        if self.dashboard:
+            shipment.list_model.dataChanged.disconnect(self.publish_progress)
+
+    def close_shipment(self, index: int):
+        """ Close shipment tab. The last tab is replaced with new empty shipment """
+        entry = self.workspace[index]
+        if entry is self.workspace.active:
+            self.disconnect_shipment(entry.shipment)
+        if self.dashboard and entry.loaded:
+            self.dashboard.remove(str(id(entry.shipment)))
+        if len(self.workspace) == 1:
+            self.add_shipment(WorkspaceEntry())
+        self.workspace.remove(index)
+        self.shipment_tabs.removeTab(index)
 
     def show_insert_popup(self):
         """ Show popup menu """
@@ -94,44 +201,44 @@ class ShipmentPackingAssistantUI(QtWidgets.QMainWindow):
     def set_shipment_number(self, value):
         """ Set shipment number """
         self.shipment.number = value
+        self.shipment_tabs.setTabText(self.shipment_tabs.currentIndex(), self.workspace.active.title)
+        self.publish_progress()
 
-    def update_ui_labels(self):
-        """ Update labels on frame """
+    def publish_progress(self):
+        """ Send shipment progress to dashboard """
+        if self.dashboard:
+            self.dashboard.publish(str(id(self.shipment)), self.shipment.progress())
+
+    def update_boxes_amount(self):
+        """ Update boxes amount label """
         self.boxes_amount.setText(self.shipment.box_amount)
+
+    def update_ui_labels(self):
+        """ Update selected sample labels on frame """
         if info := self.list_view.get_selected_sample_info():
             self.current_sample.setText(info.code)
             self.pos_from.setText(info.position)
             self.pos_to.setText(info.end_position)
             self.alarm_label.setVisible(bool(info.alarm))
 
-    def back_selection(self, selection_range):
-        """ Update selection on another view on caller-vew selection changed. """
-        selected_length = len(selection_range.indexes())
-
-        if selected_length == 1:        # back select in list
-            # collect new selection and flags
-            selected = selection_range.indexes()[0]
-            new_selection = self.shipment.item_position(selected.row(), selected.column())
-            flags = QtCore.QItemSelectionModel.ClearAndSelect | QtCore.QItemSelectionModel.Rows
-            # set selection to list and scroll
-            self.list_view.selectionModel().select(new_selection, flags)
-            self.list_view.scrollTo(new_selection)
-
-        elif selected_length >= self.shipment.list_model.weight_column_index:        # back select in map
-            # collect new selection and flags
-            selected = selection_range.indexes()[self.shipment.list_model.weight_column_index]
-            new_selection = self.shipment.item_position(selected.row())
-            flags = QtCore.QItemSelectionModel.ClearAndSelect
-            # set selection to map and scroll
-            self.map_view.selectionModel().select(new_selection, flags)
-            self.map_view.scrollTo(new_selection)
-            # correct list current index
-            self.list_view.setCurrentIndex(selected)
+    def jump_to_box(self, box: int):
+        """ Select the first item of the box in list """
+        if (index := self.shipment.box_first_item(box)).isValid():
+            self.list_view.selectRow(index.row())
             self.list_view.setFocus()
 
-        else:           # selection out of range => clear select
-            self.list_view.clearSelection()
-            self.map_view.clearSelection()
+    def find_sample(self, prefix: str = None, next_match: bool = False):
+        """ Select the item with code starting with prefix. Search from selected item if next match is required """
+        prefix = self.search_edit.text() if prefix is None else prefix
+        if not prefix:
+            return
+        selected = self.list_view.selectedIndexes()
+        after = selected[0].row() if (next_match and selected) else -1
+        if (index := self.shipment.find_sample(prefix, after)).isValid():
+            self.list_view.selectRow(index.row())
+            self.status_bar.clearMessage()
+        else:
+            self.status_bar.showMessage(f'Sample "{prefix}" was not found.')
 
     def select(self, direction: ItemSelection):
         """ Select next or previous item in list """
@@ -144,21 +251,20 @@ class ShipmentPackingAssistantUI(QtWidgets.QMainWindow):
             self.list_view.clearSelection()
 
     def import_shipment(self):
-        """ Create shipment model from Excel file """
+        """ Open Excel or native shipment files in new tabs. Files are loaded when their tabs are activated """
         list_file = QtWidgets.QFileDialog(caption='Open shipment list',
-                                          filter='Excel files (*.xls *.xlsx);;')
-        list_file.setFileMode(QFileDialog.ExistingFile)
+                                          filter=f'Shipment lists (*.xls *.xlsx *{native_format.extension});;'
+                                                 f'Excel files (*.xls *.xlsx);;'
+                                                 f'Shipment files (*{native_format.extension});;')
+        list_file.setFileMode(QFileDialog.ExistingFiles)
         if not list_file.exec():
             self.status_bar.showMessage(f'File was not opened.')
             return
-        filepath = list_file.selectedFiles()[0]
-        self.status_bar.showMessage(f'Opening file "{filepath}"')
-        file_df = pd.read_excel(filepath)
-        self.shipment.load(file_df)
-        # get shipment number from path
-        num = re.search(r'\d+', pathlib.Path(filepath).name)
-        self.shipment_number.setText(num.group(0) if num else '')
-        self.list_view.selectRow(0)
+        blank = self.shipment_tabs.currentIndex() if self.workspace.active.blank else None
+        indexes = [self.add_shipment(WorkspaceEntry(filepath)) for filepath in list_file.selectedFiles()]
+        self.shipment_tabs.setCurrentIndex(indexes[0])
+        if blank is not None:       # replace new empty shipment
+            self.close_shipment(blank)
 
     def export_map(self):
         """ Save shipment map to Excel file """
@@ -174,21 +280,55 @@ class ShipmentPackingAssistantUI(QtWidgets.QMainWindow):
         modifiers = QtWidgets.QApplication.keyboardModifiers()
         if (int(modifiers) & Qt.ShiftModifier) == Qt.ShiftModifier:
             dialog = QtWidgets.QFileDialog(caption='Export shipment map',
-                                           filter='Excel files (*.xlsx);;')
+                                           filter=f'Excel files (*.xlsx);;'
+                                                  f'Shipment files (*{native_format.extension});;'
+                                                  f'CSV files (*.csv);;'
+                                                  f'JSON Lines files (*.jsonl);;'
+                                                  f'Label printer files (*.zpl);;')
             dialog.setFileMode(QFileDialog.AnyFile)
             dialog.setAcceptMode(QFileDialog.AcceptSave)
             if not dialog.exec():
                 self.status_bar.showMessage(f'File was not selected.')
                 return
             filepath = dialog.selectedFiles()[0]
+            if native_format.extension in dialog.selectedNameFilter():      # save shipment with weights
+                if not filepath.endswith(native_format.extension):
+                    filepath += native_format.extension
+                try:
+                    self.shipment.save_native(filepath)
+                except IOError as e:
+                    self.status_bar.showMessage(str(e))
+                    return
+                self.status_bar.showMessage(f'Shipment saved "{filepath}"')
+                return
+            if suffix := next((s for s in stream_export.writers if f'*{s})' in dialog.selectedNameFilter()), None):
+                if not filepath.endswith(suffix):       # save flat list of samples with positions
+                    filepath += suffix
+                try:
+                    stream_export.save(self.shipment, filepath)
+                except (IOError, KeyError) as e:
+                    self.status_bar.showMessage(str(e))
+                    return
+                self.status_bar.showMessage(f'Samples exported "{filepath}"')
+                return
             if filepath.endswith('.xls'):
                 filepath += 'x'
             elif not filepath.endswith('.xlsx'):
                 filepath += '.xlsx'
         else:
             filepath = settings.save_path.joinpath(f'Map {self.shipment.number}.xlsx')
+        # broken samples are listed on the audit sheet of Excel map
+        if broken := (report := self.shipment.audit().report).shape[0]:
+            answer = QtWidgets.QMessageBox.warning(self, 'Export shipment map',
+                                                   f'{broken} samples do not match expected positions.\n'
+                                                   f'Export anyway? They will be listed on '
+                                                   f'"{settings.audit_sheet_name}" sheet.',
+                                                   QtWidgets.QMessageBox.Yes | QtWidgets.QMessageBox.No)
+            if answer != QtWidgets.QMessageBox.Yes:
+                self.status_bar.showMessage(f'Export canceled.')
+                return
         try:
-            self.shipment.save(filepath)
+            self.shipment.save(filepath, report)
         except IOError as e:
             self.status_bar.showMessage(e)
             return
@@ -203,6 +343,28 @@ class ShipmentPackingAssistantUI(QtWidgets.QMainWindow):
         """ Remove selected row from shipment list """
         self.list_view.remove_row()
 
+    def plan_action(self):
+        """ Reorder shipment list so samples do not span boxes. Plan is previewed before applying """
+        if self.shipment.list_model.rowCount() == 0:
+            self.status_bar.showMessage(f'No data for planning!')
+            return
+        plan = self.shipment.plan_layout()
+        boxes, splits = len(self.shipment.box_summary), int(self.shipment.box_summary.split.sum())
+        if (plan.boxes >= boxes) and (plan.splits >= splits):
+            self.status_bar.showMessage(f'Boxes are already planned.')
+            return
+        answer = QtWidgets.QMessageBox.question(self, 'Plan boxes',
+                                                f'Boxes: {boxes} -> {plan.boxes}\n'
+                                                f'Samples split between boxes: {splits} -> {plan.splits}\n\n'
+                                                f'Reorder shipment list and insert free places?',
+                                                QtWidgets.QMessageBox.Yes | QtWidgets.QMessageBox.No)
+        if answer != QtWidgets.QMessageBox.Yes:
+            self.status_bar.showMessage(f'Planning canceled.')
+            return
+        self.shipment.apply_layout(plan)
+        self.list_view.selectRow(0)
+        self.status_bar.showMessage(f'Boxes planned: {plan.boxes} boxes, {plan.splits} samples split.')
+
     def work_action(self):
         """ Start/stop recognizer thread"""
         if self.shipment.list_model.rowCount() == 0:
@@ -227,11 +389,18 @@ class ShipmentPackingAssistantUI(QtWidgets.QMainWindow):
                 self.status_bar.showMessage(f'Recognizer suspended!')
                 self.work_button.setText('start')
                 self.work_button.setIcon(QtGui.QIcon(pathlib.Path().joinpath('resources', 'start.svg').as_posix()))
+            elif isinstance(data, InputStatus):
+                self.status_bar.showMessage(data.message)
+            elif isinstance(data, SampleSearch):
+                self.search_edit.setText(data.prefix)
+                self.find_sample(data.prefix)
             else:
                 self.list_view.switch_selection.emit(data)
-        else:
-            self.shipment.set_weight(self.list_view.selectedIndexes()[0].row(), data)
+        elif selected := self.list_view.selectedIndexes():
+            self.shipment.set_weight(selected[0].row(), data)
             self.list_view.switch_selection.emit(ItemSelection.NEXT)
+        else:       # scale sends weights without operator action
+            self.status_bar.showMessage(f'Weight {data} was ignored: no sample is selected!')
 
     @validate_selection('list_view')
     def debug_action(self, *args, selected=None, **kwargs):
@@ -0,0 +1,104 @@
+import settings
+import argparse
+import pathlib
+import sys
+import typing
+import numpy as np
+import pandas as pd
+from additional import format_weight
+
+
+def records(shipment, chunk_size: int = settings.stream_export_chunk) -> typing.Iterator[pd.DataFrame]:
+    """ Generate export records of shipment samples (code, box, row and column in box, weight) by chunks,
+        so writers keep constant memory. Free rows are skipped
+        :param shipment
+            ShipmentModel
+        :param chunk_size
+            amount of list rows processed at once """
+    df = shipment.list_model.df
+    box_height = shipment.box_options.rows + shipment.box_options.separator
+    map_columns = np.asarray(shipment.map_columns, dtype='object')
+    for start in range(0, df.shape[0], chunk_size):
+        chunk = df.iloc[start:start + chunk_size]
+        codes = chunk[settings.code_column].astype('str').to_numpy(dtype='object')
+        rows = np.arange(start, start + chunk.shape[0])
+        map_rows, map_cols = shipment.map_positions(rows)
+        boxes = (map_rows // box_height + 1).astype('str').astype('object')
+        weights = chunk[settings.weight_column].to_numpy(dtype='float64')      # already rounded to weight precision
+        samples = codes != ''
+        yield pd.DataFrame(dict(zip(settings.stream_export_columns,
+                                    (codes[samples],
+                                     (f'{shipment.number}.' if shipment.number else '') + boxes[samples],
+                                     map_rows[samples] % box_height + 1,
+                                     map_columns[map_cols[samples]],
+                                     weights[samples]))))
+
+
+def write_csv(chunks: typing.Iterable[pd.DataFrame], file: typing.TextIO):
+    """ Write records as CSV with header """
+    header = True
+    for chunk in chunks:
+        chunk.to_csv(file, header=header, index=False)
+        header = False
+
+
+def write_jsonl(chunks: typing.Iterable[pd.DataFrame], file: typing.TextIO):
+    """ Write records as JSON Lines, not weighed is null """
+    for chunk in chunks:
+        if chunk.shape[0]:
+            # trailing newline of lines output differs between pandas versions
+            file.write(chunk.to_json(orient='records', lines=True, force_ascii=False).rstrip('\n') + '\n')
+
+
+def write_labels(chunks: typing.Iterable[pd.DataFrame], file: typing.TextIO, template: str = settings.label_template):
+    """ Write records formatted by printer template, fields are referenced by names: {code}, {box} and so on.
+        Weight is formatted as in the list, not weighed is empty """
+    for chunk in chunks:
+        fields = chunk.columns.tolist()
+        values = [chunk[field].map(format_weight).tolist() if field == 'weight' else chunk[field].tolist()
+                  for field in fields]
+        file.writelines(template.format_map(dict(zip(fields, record))) for record in zip(*values))
+
+
+writers = {'.csv': write_csv,
+           '.jsonl': write_jsonl,
+           '.zpl': write_labels}
+
+
+def save(shipment, filepath, template: str = None):
+    """ Export shipment samples to file, format is chosen by extension """
+    writer = writers.get(pathlib.Path(filepath).suffix.lower())
+    if writer is None:
+        raise ValueError(f'Unknown export format: "{filepath}"')
+    kwargs = {'template': template} if (writer is write_labels) and template else {}
+    with open(filepath, 'w', encoding='utf-8', newline='') as file:
+        writer(records(shipment), file, **kwargs)
+
+
+# headless batch export
+if __name__ == '__main__':
+    from shipment_workspace import WorkspaceEntry
+
+    parser = argparse.ArgumentParser(description='Export shipment samples with box positions '
+                                                 f'to {", ".join(writers)} file.')
+    parser.add_argument('source', help='Excel or native shipment file')
+    parser.add_argument('target', help='output file, format is chosen by extension')
+    parser.add_argument('--number', help='shipment number, by default it is taken from the source')
+    parser.add_argument('--template', type=pathlib.Path, help='label printer template file for .zpl export')
+    args = parser.parse_args()
+
+    entry = WorkspaceEntry(args.source)
+    try:
+        entry.load()
+    except (IOError, ValueError, KeyError) as e:
+        sys.exit(str(e))
+    if entry.message and entry.message.startswith('ERROR!'):
+        sys.exit(entry.message)
+    elif entry.message:
+        print(entry.message, file=sys.stderr)
+    if args.number is not None:
+        entry.shipment.number = args.number
+    try:
+        save(entry.shipment, args.target, args.template.read_text(encoding='utf-8') if args.template else None)
+    except (IOError, ValueError, KeyError) as e:
+        sys.exit(str(e))